@@ -14,6 +14,7 @@ from utils.logger import clear_logs, setup_logging
 from utils import credentials_manager
 from utils import encryption
 from utils import settings_manager
+from utils.json_provider import OrjsonProvider
 from vendors.vonage.routes import vonage_bp
 from vendors.vonage.transfer_routes import vonage_transfer_bp
 from vendors.vonage.did_inventory_routes import vonage_did_inventory_bp
@@ -21,6 +22,7 @@ from routes.notifications import notifications_bp
 
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app) # Used by request.get_json() and jsonify() in every blueprint
 
 # Configuration file paths
 IP_CONFIG_FILE = os.path.join('config', 'ips.json')
@@ -62,7 +64,7 @@ def get_npa_data():
 def get_app_settings():
     try:
         settings = settings_manager.get_all_settings()
-        return jsonify(settings), 200
+        return jsonify(dict(settings)), 200
     except Exception as e:
         return jsonify({"error": f"Failed to load settings: {str(e)}"}), 500
 
@@ -83,7 +85,7 @@ def save_app_settings():
 def get_credential_names():
     try:
         names = credentials_manager.get_credential_names()
-        all_creds = credentials_manager.get_all_credentials()
+        all_creds = credentials_manager.get_all_credentials_view()
         creds_with_details = [
             {
                 "name": name,
@@ -277,4 +279,5 @@ if __name__ == '__main__':
     open('routes/__init__.py', 'a').close()
     open('vendors/__init__.py', 'a').close()
     open('vendors/vonage/__init__.py', 'a').close()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Threaded so the UI's parallel per-DID requests (max_concurrent_requests) are served concurrently
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -25,7 +25,6 @@ from typing import Optional, List
 from utils import credentials_manager
 from utils import settings_manager
 from utils import job_manager
-from utils import encryption
 from vendors.vonage import client as vonage_client
 from vendors.vonage.did_inventory_tasks import fetch_dids_for_accounts
 
@@ -116,25 +115,7 @@ def _build_search_params(country=None, pattern=None, search_pattern=None):
 def _decrypt_all_credentials():
     """Decrypts all stored credentials using the server-side MASTER_KEY."""
     _ensure_master_key()
-    all_creds = credentials_manager.get_all_credentials()
-    decrypted = []
-
-    for name, cred_data in all_creds.items():
-        try:
-            encrypted_secret = cred_data.get('encrypted_secret')
-            if not encrypted_secret:
-                continue
-            decrypted_secret = encryption.decrypt_data(encrypted_secret, MASTER_KEY)
-            decrypted.append({
-                'api_key': cred_data['api_key'],
-                'api_secret': decrypted_secret,
-                'account_name': name,
-                'api_key_hint': cred_data.get('api_key_hint', '')
-            })
-        except Exception:
-            continue
-
-    return decrypted
+    return credentials_manager.decrypt_all_credentials(MASTER_KEY)
 
 
 def _decrypt_selected_credentials(groupids):
@@ -1,5 +1,6 @@
 import os
 import asyncio
+from collections import Counter
 from dotenv import load_dotenv
 from fastapi import FastAPI, Depends, HTTPException, Security, status, Request
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
@@ -10,10 +11,12 @@ from typing import Optional, List
 # --- Import Core Application Logic ---
 from utils.config_loader import load_config_file
 from utils import credentials_manager
+from utils import encryption
 from utils import settings_manager
 from utils import logger
 from utils import notification_service
 from vendors.vonage import client as vonage_client
+from vendors.vonage import async_client as vonage_async_client
 from utils import db_manager
 from transfer_endpoints import transfer_router
 from did_inventory_endpoints import inventory_router
@@ -35,6 +38,8 @@ if TRUSTED_PROXY_IPS:
 # --- Configuration Loading ---
 NPA_DATA_CONFIG_FILE = os.path.join('config', 'npa_data.json')
 NPA_DATA = load_config_file(NPA_DATA_CONFIG_FILE)
+# NPA -> 'US' or 'CA', so country detection is one dict lookup instead of scanning both lists.
+NPA_COUNTRY = {npa: country for country in ('CA', 'US') for npa in NPA_DATA.get(country, [])}
 
 # --- Security and Authentication ---
 API_KEY_HEADER = APIKeyHeader(name="X-API-Key", auto_error=True)
@@ -92,16 +97,33 @@ def _resolve_country_and_msisdn(raw_did: str, country_hint: Optional[str] = None
     if not country:
         national_number = msisdn[-10:]
         if len(national_number) == 10:
-            npa = national_number[:3]
-            if npa in NPA_DATA.get('US', []):
-                country = 'US'
-            elif npa in NPA_DATA.get('CA', []):
-                country = 'CA'
+            country = NPA_COUNTRY.get(national_number[:3])
             if country and not msisdn.startswith('1'):
                 msisdn = '1' + national_number
 
     return country, msisdn
 
+async def _call_vonage(fn, creds: dict, **kwargs) -> tuple:
+    """
+    Calls a Vonage client function for the given subaccount. Coroutines from
+    vonage_async_client run on the shared async client; blocking vonage_client
+    calls run in a worker thread.
+
+    Returns (result, error) where error is the API error message when the call
+    failed (status >= 400) and None on success.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        result, status_code = await fn(
+            vonage_async_client.get_client(), username=creds['api_key'], password=creds['api_secret'], **kwargs
+        )
+    else:
+        result, status_code = await asyncio.to_thread(
+            fn, username=creds['api_key'], password=creds['api_secret'], **kwargs
+        )
+    if status_code is None or status_code >= 400:
+        return result, result.get('error', 'Unknown error') if isinstance(result, dict) else str(result)
+    return result, None
+
 # --- Pydantic Data Models ---
 class DIDProvisionRequest(BaseModel):
     groupid: str = Field(..., description="The unique group ID to match against a subaccount name.")
@@ -260,8 +282,10 @@ async def startup_event():
     if credentials_manager.STORAGE_MODE == 'db':
         print("FastAPI starting up, initializing database connection...")
         db_manager.init_db()
-        settings_manager.get_all_settings()
+        settings_manager.get_all_settings(force=True)
         print("Application settings loaded into cache.")
+        # Derive the key and build the shared Fernet now so the first request doesn't pay for the KDF.
+        await asyncio.to_thread(encryption.encrypt_data, "warmup", MASTER_KEY)
     else:
         print("FastAPI starting up in 'file' mode. Endpoints will not be available.")
     if IP_WHITELIST: print(f"FastAPI IP Whitelist is active. Allowed IPs: {IP_WHITELIST}")
@@ -269,6 +293,10 @@ async def startup_event():
     if credentials_manager.STORAGE_MODE == 'db' and not VONAGE_PRIMARY_ACCOUNT_NAME:
         print("WARNING: `VONAGE_PRIMARY_ACCOUNT_NAME` is not set. The auto-create subaccount feature will be disabled.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await vonage_async_client.close_client()
+
 @app.post("/provision-did", response_model=ProvisioningResponse, dependencies=[Depends(verify_ip_address), Depends(verify_api_key)], tags=["Provisioning"])
 async def provision_did_endpoint(request: DIDProvisionRequest, request_obj: Request):
     if credentials_manager.STORAGE_MODE != 'db': raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Endpoint not available in 'file' storage mode.")
@@ -313,16 +341,20 @@ async def provision_did_endpoint(request: DIDProvisionRequest, request_obj: Requ
     
     if log_enabled: logger.log_request_response(operation_name="Incoming Provisioning Request", request_details={"client_ip": request_obj.client.host, "payload": request.model_dump()}, response_data={"status": "Request accepted for processing"}, status_code=202, account_id=subaccount_creds['api_key'])
     
-    country = 'US' if request.npa in NPA_DATA.get('US', []) else 'CA' if request.npa in NPA_DATA.get('CA', []) else None
+    country = NPA_COUNTRY.get(request.npa)
     if not country: raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"NPA '{request.npa}' not found in US or CA data.")
     
+    # Search, buy and configure share the async client's pooled connection to Vonage and
+    # don't hold up the event loop while waiting on it.
+    settings = settings_manager.get_settings(['treat_420_as_success_buy', 'verify_on_420_buy', 'treat_420_as_success_configure'])
+    vonage = vonage_async_client.get_client()
     search_params = { 'country': country, 'features': 'VOICE', 'pattern': f"1{request.npa}", 'search_pattern': 0, 'size': 1 }
-    search_result, search_status = vonage_client.search_dids(subaccount_creds['api_key'], subaccount_creds['api_secret'], search_params, log_enabled=log_enabled)
+    search_result, search_status = await vonage_async_client.search_dids_async(vonage, subaccount_creds['api_key'], subaccount_creds['api_secret'], search_params, log_enabled=log_enabled)
     if search_status >= 400 or not search_result.get('numbers'): raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Failed to find an available DID for NPA {request.npa}. Vonage API error: {search_result.get('error', 'Unknown error')}")
     
     did_to_buy = search_result['numbers'][0]
     msisdn = did_to_buy.get('msisdn')
-    buy_result, buy_status = vonage_client.buy_did(username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country, msisdn=msisdn, log_enabled=log_enabled, treat_420_as_success=settings_manager.get_setting('treat_420_as_success_buy'), verify_on_420=settings_manager.get_setting('verify_on_420_buy'))
+    buy_result, buy_status = await vonage_async_client.buy_did_async(vonage, username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country, msisdn=msisdn, log_enabled=log_enabled, treat_420_as_success=settings['treat_420_as_success_buy'], verify_on_420=settings['verify_on_420_buy'])
     if buy_status >= 400: raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Failed to purchase DID {msisdn}. Vonage API error: {buy_result.get('error', 'Unknown error')}")
     
     configuration_status, callback_type_to_use, callback_value_to_use, source_of_config = "Skipped", None, None, None
@@ -336,7 +368,7 @@ async def provision_did_endpoint(request: DIDProvisionRequest, request_obj: Requ
         final_callback_value = callback_value_to_use
         if callback_type_to_use == 'sip' and '@' not in final_callback_value: final_callback_value = f"{_get_national_number(msisdn, country)}@{final_callback_value}"
         update_config = {'voiceCallbackType': callback_type_to_use, 'voiceCallbackValue': final_callback_value}
-        update_result, update_status = vonage_client.update_did(username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country, msisdn=msisdn, config=update_config, log_enabled=log_enabled, treat_420_as_success=settings_manager.get_setting('treat_420_as_success_configure'))
+        update_result, update_status = await vonage_async_client.update_did_async(vonage, username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country, msisdn=msisdn, config=update_config, log_enabled=log_enabled, treat_420_as_success=settings['treat_420_as_success_configure'])
         if update_status < 400: configuration_status = f"Applied successfully from {source_of_config}."
         else: configuration_status = f"Failed to apply settings from {source_of_config}: {update_result.get('error', 'Unknown error')}"
     else: configuration_status = "Skipped: No settings provided in request and no defaults configured for this group."
@@ -382,7 +414,8 @@ async def update_did_endpoint(request: DIDUpdateRequest, request_obj: Request):
         update_config['voiceCallbackValue'] = final_callback_value
     if not update_config:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No update parameters provided. Please specify fields to update, e.g., 'voice_callback_type'.")
-    update_result, update_status = vonage_client.update_did(
+    update_result, update_status = await vonage_async_client.update_did_async(
+        vonage_async_client.get_client(),
         username=subaccount_creds['api_key'],
         password=subaccount_creds['api_secret'],
         country=country_to_use,
@@ -425,7 +458,7 @@ async def release_did_endpoint(request: DIDReleaseRequest, request_obj: Request)
     if not country_to_use:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not auto-detect country from DID. Please provide a 2-letter 'country' code for non-US/CA numbers.")
     if log_enabled: logger.log_request_response(operation_name="Incoming Release Request", request_details={ "client_ip": request_obj.client.host, "payload": request.model_dump() }, response_data={"status": "Request accepted for processing", "determined_country": country_to_use}, status_code=202, account_id=subaccount_creds['api_key'])
-    result_data, status_code = vonage_client.cancel_did(username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country_to_use, msisdn=msisdn_to_use, log_enabled=log_enabled)
+    result_data, status_code = await vonage_async_client.cancel_did_async(vonage_async_client.get_client(), username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country_to_use, msisdn=msisdn_to_use, log_enabled=log_enabled)
     if status_code >= 400: raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Failed to release DID {request.did}. Vonage API error: {result_data.get('error', 'Unknown error')}")
     
     notif_payload = {
@@ -525,18 +558,17 @@ async def _process_single_did_update(did_item, subaccount_creds, request, log_en
         if request.voice_callback_type == 'sip' and '@' not in final_callback_value and final_callback_value != '':
             final_callback_value = f"{_get_national_number(msisdn_to_use, country_to_use)}@{final_callback_value}"
         update_config['voiceCallbackValue'] = final_callback_value
-        update_result, update_status = await asyncio.to_thread(
-            vonage_client.update_did,
-            username=subaccount_creds['api_key'],
-            password=subaccount_creds['api_secret'],
+        _, error = await _call_vonage(
+            vonage_async_client.update_did_async,
+            subaccount_creds,
             country=country_to_use,
             msisdn=msisdn_to_use,
             config=update_config,
             log_enabled=log_enabled,
             treat_420_as_success=treat_420_as_success
         )
-        if update_status >= 400:
-            return BatchResult(did=did_item.did, status='failed', detail=f"Vonage API error: {update_result.get('error', 'Unknown error')}")
+        if error:
+            return BatchResult(did=did_item.did, status='failed', detail=f"Vonage API error: {error}")
         return BatchResult(did=did_item.did, status='success', detail="DID updated successfully.")
     except Exception as e:
         return BatchResult(did=did_item.did, status='failed', detail=f"An unexpected internal error occurred: {str(e)}")
@@ -586,29 +618,50 @@ async def provision_dids_batch_endpoint(request: DIDBatchProvisionRequest):
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to save or re-fetch new credentials: {e}")
 
+    # Search once per distinct NPA, sized to how often it was requested, so duplicate
+    # NPAs share one API call and are handed distinct candidate DIDs.
+    npa_counts = Counter(request.npas)
+    unique_npas = list(npa_counts)
+    candidates_by_npa = {}
+    for i in range(0, len(unique_npas), max_concurrency):
+        batch = unique_npas[i:i + max_concurrency]
+        search_results = await asyncio.gather(*[
+            _search_dids_for_npa(npa, npa_counts[npa], subaccount_creds, log_enabled) for npa in batch
+        ])
+        for npa, (country, msisdns, error) in zip(batch, search_results):
+            candidates_by_npa[npa] = (country, iter(msisdns), error)
+        if i + max_concurrency < len(unique_npas):
+            await asyncio.sleep(delay_ms / 1000.0)
+
     results = []
     for i in range(0, len(request.npas), max_concurrency):
         batch = request.npas[i:i + max_concurrency]
-        tasks = [
-            _process_single_did_provision(
-                npa=npa,
-                groupid=request.groupid, # Pass groupid through
-                subaccount_creds=subaccount_creds,
-                request=request,
-                settings={
-                    "log_enabled": log_enabled,
-                    "treat_420_as_success_buy": treat_420_as_success_buy,
-                    "verify_on_420_buy": verify_on_420_buy,
-                    "treat_420_as_success_configure": treat_420_as_success_configure,
-                },
-            ) for npa in batch
-        ]
+        tasks = []
+        for npa in batch:
+            country, msisdns, search_error = candidates_by_npa[npa]
+            tasks.append(
+                _process_single_did_provision(
+                    npa=npa,
+                    country=country,
+                    msisdn=next(msisdns, None),
+                    search_error=search_error,
+                    groupid=request.groupid, # Pass groupid through
+                    subaccount_creds=subaccount_creds,
+                    request=request,
+                    settings={
+                        "log_enabled": log_enabled,
+                        "treat_420_as_success_buy": treat_420_as_success_buy,
+                        "verify_on_420_buy": verify_on_420_buy,
+                        "treat_420_as_success_configure": treat_420_as_success_configure,
+                    },
+                )
+            )
         batch_results = await asyncio.gather(*tasks)
         results.extend(batch_results)
         if i + max_concurrency < len(request.npas):
             await asyncio.sleep(delay_ms / 1000.0)
 
-    success_count = sum(1 for r in results if r.status == 'success' or r.status == 'partial_success')
+    success_count = sum(1 for r in results if r.status in ('success', 'partial_success'))
     failed_count = len(results) - success_count
     final_message = "Batch provisioning process completed."
     if request.update_group_defaults:
@@ -627,44 +680,52 @@ async def provision_dids_batch_endpoint(request: DIDBatchProvisionRequest):
         success_count=success_count, failed_count=failed_count, results=results
     )
 
-async def _process_single_did_provision(npa, groupid, subaccount_creds, request, settings):
+async def _search_dids_for_npa(npa, quantity, subaccount_creds, log_enabled):
+    """
+    Searches for up to `quantity` available DIDs in a single NPA with one API call.
+    Returns (country, msisdns, error) — error is None on success.
+    """
+    country = NPA_COUNTRY.get(npa)
+    if not country:
+        return None, [], "NPA not found in US or CA data."
     try:
-        country = 'US' if npa in NPA_DATA.get('US', []) else 'CA' if npa in NPA_DATA.get('CA', []) else None
-        if not country:
-            return BatchProvisionResult(npa=npa, status='failed', detail=f"NPA not found in US or CA data.")
-
-        search_params = {'country': country, 'features': 'VOICE', 'pattern': f"1{npa}", 'search_pattern': 0, 'size': 1}
-        search_result, search_status = await asyncio.to_thread(
-            vonage_client.search_dids, subaccount_creds['api_key'], subaccount_creds['api_secret'], search_params, log_enabled=settings['log_enabled']
+        search_params = {'country': country, 'features': 'VOICE', 'pattern': f"1{npa}", 'search_pattern': 0, 'size': quantity}
+        search_result, error = await _call_vonage(
+            vonage_client.search_dids, subaccount_creds, search_params=search_params, log_enabled=log_enabled
         )
-        if search_status >= 400 or not search_result.get('numbers'):
-            return BatchProvisionResult(npa=npa, status='failed', detail=f"No available numbers found. API error: {search_result.get('error', 'Unknown')}")
+    except Exception as e:
+        return country, [], f"An unexpected internal error occurred: {str(e)}"
+    if error or not search_result.get('numbers'):
+        return country, [], f"No available numbers found. API error: {error or 'Unknown'}"
+    return country, [num.get('msisdn') for num in search_result['numbers']], None
 
-        did_to_buy = search_result['numbers'][0]
-        msisdn = did_to_buy.get('msisdn')
+async def _process_single_did_provision(npa, country, msisdn, search_error, groupid, subaccount_creds, request, settings):
+    try:
+        if search_error:
+            return BatchProvisionResult(npa=npa, status='failed', detail=search_error)
+        if not msisdn:
+            return BatchProvisionResult(npa=npa, status='failed', detail="No available numbers found. API error: Not enough numbers returned for this NPA.")
 
-        buy_result, buy_status = await asyncio.to_thread(
-            vonage_client.buy_did,
-            username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country, msisdn=msisdn,
+        _, error = await _call_vonage(
+            vonage_async_client.buy_did_async, subaccount_creds, country=country, msisdn=msisdn,
             log_enabled=settings['log_enabled'], treat_420_as_success=settings['treat_420_as_success_buy'], verify_on_420=settings['verify_on_420_buy']
         )
-        if buy_status >= 400:
-            return BatchProvisionResult(npa=npa, status='failed', detail=f"Failed to purchase DID {msisdn}. API error: {buy_result.get('error', 'Unknown')}")
+        if error:
+            return BatchProvisionResult(npa=npa, status='failed', detail=f"Failed to purchase DID {msisdn}. API error: {error}")
         
         final_callback_value = request.voice_callback_value
         if request.voice_callback_type == 'sip' and '@' not in final_callback_value:
             final_callback_value = f"{_get_national_number(msisdn, country)}@{final_callback_value}"
         update_config = {'voiceCallbackType': request.voice_callback_type, 'voiceCallbackValue': final_callback_value}
         
-        update_result, update_status = await asyncio.to_thread(
-            vonage_client.update_did,
-            username=subaccount_creds['api_key'], password=subaccount_creds['api_secret'], country=country, msisdn=msisdn, config=update_config,
+        _, update_error = await _call_vonage(
+            vonage_async_client.update_did_async, subaccount_creds, country=country, msisdn=msisdn, config=update_config,
             log_enabled=settings['log_enabled'], treat_420_as_success=settings['treat_420_as_success_configure']
         )
         
         configuration_status = "Applied successfully."
-        if update_status >= 400:
-            configuration_status = f"Failed to apply configuration: {update_result.get('error', 'Unknown')}"
+        if update_error:
+            configuration_status = f"Failed to apply configuration: {update_error}"
             
         notif_payload = {
             "groupid": groupid,
@@ -678,7 +739,7 @@ async def _process_single_did_provision(npa, groupid, subaccount_creds, request,
         }
         notification_service.fire_and_forget("did.provisioned", notif_payload)
 
-        if update_status >= 400:
+        if update_error:
             return BatchProvisionResult(npa=npa, status='partial_success', provisioned_did=msisdn, detail=f"Provisioned DID {msisdn} but failed to apply configuration.")
 
         return BatchProvisionResult(npa=npa, status='success', provisioned_did=msisdn, detail=f"Successfully provisioned and configured DID {msisdn}.")
@@ -767,7 +828,7 @@ async def _process_single_did_release(
     """
     Processes a single DID release within a batch.
 
-    Uses asyncio.to_thread to wrap the blocking vonage_client.cancel_did call.
+    Uses _call_vonage to run vonage_async_client.cancel_did_async on the shared async client.
     Each invocation is independently try/caught so one failure cannot cascade.
     """
     try:
@@ -780,20 +841,19 @@ async def _process_single_did_release(
                 detail="Could not auto-detect country. Please provide a 2-letter 'country' code."
             )
 
-        result_data, status_code = await asyncio.to_thread(
-            vonage_client.cancel_did,
-            username=subaccount_creds['api_key'],
-            password=subaccount_creds['api_secret'],
+        _, error = await _call_vonage(
+            vonage_async_client.cancel_did_async,
+            subaccount_creds,
             country=country,
             msisdn=msisdn,
             log_enabled=log_enabled
         )
 
-        if status_code >= 400:
+        if error:
             return BatchResult(
                 did=did_item.did,
                 status='failed',
-                detail=f"Vonage API error: {result_data.get('error', 'Unknown error')}"
+                detail=f"Vonage API error: {error}"
             )
 
         # Fire notification for each successful release
@@ -28,6 +28,7 @@ import os
 # --- Configuration ---
 NPA_DATA_CONFIG_FILE = os.path.join('config', 'npa_data.json')
 NPA_DATA = load_config_file(NPA_DATA_CONFIG_FILE)
+NPA_COUNTRY = {npa: country for country in ('CA', 'US') for npa in NPA_DATA.get(country, [])} # NPA -> 'US' or 'CA'
 
 MASTER_KEY = os.environ.get("MASTER_KEY")
 VONAGE_PRIMARY_ACCOUNT_NAME = os.environ.get("VONAGE_PRIMARY_ACCOUNT_NAME")
@@ -112,11 +113,7 @@ def _detect_country(msisdn: str) -> Optional[str]:
     clean = re.sub(r'\D', '', msisdn)
     national = clean[-10:] if len(clean) >= 10 else clean
     if len(national) == 10:
-        npa = national[:3]
-        if npa in NPA_DATA.get('US', []):
-            return 'US'
-        elif npa in NPA_DATA.get('CA', []):
-            return 'CA'
+        return NPA_COUNTRY.get(national[:3])
     return None
 
 
@@ -2,15 +2,27 @@
 import os
 import json
 
+# filepath -> (mtime_ns, size, parsed data). The UI serves these files on every page load,
+# so they are only re-read and re-parsed when they change on disk.
+_file_cache = {}
+
 def load_config_file(filepath):
     """Loads a JSON configuration file.
 
     Creates the directory and an empty list file if it doesn't exist.
     Returns an empty list if the file is found but cannot be decoded.
+    The parsed data is cached until the file changes and shared between
+    callers, so treat it as read-only.
     """
     try:
+        stat = os.stat(filepath)
+        cached = _file_cache.get(filepath)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
         with open(filepath, 'r') as f:
-            return json.load(f)
+            data = json.load(f)
+        _file_cache[filepath] = (stat.st_mtime_ns, stat.st_size, data)
+        return data
     except FileNotFoundError:
         print(f"Warning: Configuration file {filepath} not found. Creating empty default.")
         try:
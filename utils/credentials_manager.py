@@ -1,10 +1,18 @@
 import os
-import json
-from threading import Lock
+import orjson
+import tempfile
+from threading import Condition, Lock
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import MappingProxyType
+from cryptography.fernet import Fernet
 
 # Import the encryption functions from our new utility
-from .encryption import encrypt_data, decrypt_data
+from .encryption import (
+    encrypt_data, decrypt_data, encrypt_with_fernet, decrypt_with_fernet,
+    get_key_from_master, invalidate_key_cache
+)
 
 # Import the new database manager
 from . import db_manager
@@ -16,8 +24,57 @@ STORAGE_MODE = os.environ.get('CREDENTIAL_STORAGE_MODE', 'file').lower()
 # Define the path to the file where encrypted credentials will be stored.
 CREDENTIALS_FILE = os.path.join('config', 'credentials.json')
 
-# A file lock to prevent race conditions when reading/writing the JSON file.
-file_lock = Lock()
+
+class _ReadWriteLock:
+    """
+    A minimal readers-writer lock: any number of concurrent readers, or one writer.
+    Waiting writers block new readers so saves are not starved by a steady read load.
+    """
+
+    def __init__(self):
+        self._cond = Condition(Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+# A readers-writer lock to prevent race conditions when reading/writing the JSON file.
+# Reads (the hot path) proceed in parallel; only saves take the lock exclusively.
+file_lock = _ReadWriteLock()
+
+# Parsed contents of CREDENTIALS_FILE as (st_mtime_ns, st_size, data, view). Reused until
+# the file changes on disk, so reads skip the open + parse when nothing was saved.
+# `view` is a read-only proxy over `data` that is handed out to readers without copying.
+_file_cache = None
 
 
 # Initialize the database if the mode is 'db'.
@@ -25,44 +82,110 @@ if STORAGE_MODE == 'db':
     db_manager.init_db()
 
 
+_EMPTY_CREDENTIALS = MappingProxyType({})
+
+
 def _file_get_all_credentials():
-    # (Function unchanged)
-    with file_lock:
-        if not os.path.exists(CREDENTIALS_FILE):
-            return {}
+    """
+    Returns all credentials from the JSON file as a read-only mapping, re-parsing
+    the file only when its mtime or size has changed. Use
+    _file_get_all_credentials_for_update() when the result will be modified.
+    """
+    global _file_cache
+    with file_lock.read():
+        try:
+            stat = os.stat(CREDENTIALS_FILE)
+        except OSError:
+            return _EMPTY_CREDENTIALS
+
+        cache = _file_cache
+        if cache is not None and cache[0] == stat.st_mtime_ns and cache[1] == stat.st_size:
+            return cache[3]
+
         try:
-            os.makedirs(os.path.dirname(CREDENTIALS_FILE), exist_ok=True)
-            with open(CREDENTIALS_FILE, 'r') as f:
+            with open(CREDENTIALS_FILE, 'rb') as f:
                 content = f.read()
-                if not content:
-                    return {}
-                creds = json.loads(content)
-                for name, data in creds.items():
-                    data.setdefault('default_voice_callback_type', '')
-                    data.setdefault('default_voice_callback_value', '')
-                return creds
-        except (IOError, json.JSONDecodeError):
-            return {}
+            creds = orjson.loads(content) if content else {}
+            for name, data in creds.items():
+                data.setdefault('default_voice_callback_type', '')
+                data.setdefault('default_voice_callback_value', '')
+        except (IOError, orjson.JSONDecodeError):
+            return _EMPTY_CREDENTIALS
+        view = MappingProxyType({name: MappingProxyType(data) for name, data in creds.items()})
+        _file_cache = (stat.st_mtime_ns, stat.st_size, creds, view)
+        return view
+
+def _file_get_all_credentials_for_update() -> dict:
+    """Returns a mutable copy of all credentials from the JSON file."""
+    return {name: dict(data) for name, data in _file_get_all_credentials().items()}
 
 def _file_save_all_credentials(credentials: dict):
-    # (Function unchanged)
-    with file_lock:
-        os.makedirs(os.path.dirname(CREDENTIALS_FILE), exist_ok=True)
-        with open(CREDENTIALS_FILE, 'w') as f:
-            json.dump(credentials, f, indent=4)
+    """
+    Writes all credentials atomically: the JSON goes to a temp file in the same
+    directory, which then replaces CREDENTIALS_FILE, so a failed write never
+    leaves a truncated credentials file behind.
+    """
+    global _file_cache
+    with file_lock.write():
+        credentials_dir = os.path.dirname(CREDENTIALS_FILE)
+        os.makedirs(credentials_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=credentials_dir, suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            try:
+                f.write(orjson.dumps(credentials))
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                f.close()
+                os.unlink(tmp_path)
+                raise
+        os.replace(tmp_path, CREDENTIALS_FILE)
+        # mtime granularity can be coarse; never trust the old entry after a write.
+        _file_cache = None
+
+def _file_delete_credential(name: str) -> bool:
+    all_creds = _file_get_all_credentials_for_update()
+    if name in all_creds:
+        del all_creds[name]
+        _file_save_all_credentials(all_creds)
+        return True
+    return False
 
 
-def get_all_credentials():
-    # (Function unchanged)
-    if STORAGE_MODE == 'db':
-        return db_manager.db_get_all_credentials()
-    else: # Default to file
-        return _file_get_all_credentials()
+def _db_get_all_credentials_view():
+    """Database credentials wrapped read-only, matching what the file backend hands out."""
+    return MappingProxyType({
+        name: MappingProxyType(data) for name, data in db_manager.db_get_all_credentials().items()
+    })
+
+
+# The storage mode is fixed for the life of the process, so pick the backend once.
+if STORAGE_MODE == 'db':
+    _get_all = db_manager.db_get_all_credentials
+    _get_all_view = _db_get_all_credentials_view
+    _delete = db_manager.db_delete_credential
+else: # Default to file
+    _get_all = _file_get_all_credentials_for_update
+    _get_all_view = _file_get_all_credentials
+    _delete = _file_delete_credential
+
+
+def get_all_credentials() -> dict:
+    """Returns all stored credentials as new plain dicts, which the caller may modify."""
+    return _get_all()
+
+
+def get_all_credentials_view():
+    """
+    Returns all stored credentials as a read-only mapping of read-only mappings, in
+    either storage mode. In file mode this is the shared cached copy, so reading it
+    costs no parse or copy; use get_all_credentials() for anything that modifies them.
+    """
+    return _get_all_view()
 
 
 def get_credential_names():
-    # (Function unchanged)
-    creds = get_all_credentials()
+    creds = get_all_credentials_view()
     return sorted(list(creds.keys()))
 
 
@@ -84,8 +207,13 @@ def save_credential(name: str, api_key: str, api_secret: str, master_key: str,
     if not original_name:
         original_name = name
 
-    all_creds = get_all_credentials()
-    existing_cred = all_creds.get(original_name)
+    # Only the credential being edited is needed; in DB mode fetch just that row.
+    if STORAGE_MODE == 'db':
+        all_creds = None
+        existing_cred = db_manager.db_get_credential(original_name)
+    else:
+        all_creds = _file_get_all_credentials_for_update()
+        existing_cred = all_creds.get(original_name)
     
     encrypted_secret = None
 
@@ -136,24 +264,15 @@ def save_credential(name: str, api_key: str, api_secret: str, master_key: str,
 
 
 def delete_credential(name: str) -> bool:
-    # (Function unchanged)
-    if STORAGE_MODE == 'db':
-        return db_manager.db_delete_credential(name)
-    else:
-        all_creds = _file_get_all_credentials()
-        if name in all_creds:
-            del all_creds[name]
-            _file_save_all_credentials(all_creds)
-            return True
-        return False
+    return _delete(name)
 
 
 def get_decrypted_credentials(name: str, master_key: str) -> dict:
-    # (Function unchanged)
     if not master_key:
         raise ValueError("A master key is required to decrypt credentials.")
-    all_creds = get_all_credentials()
-    credential_data = all_creds.get(name)
+    # Called on every UI request; in DB mode fetch just the one row instead of the whole table.
+    # The derived key is cached by the encryption module, so only the Fernet decrypt remains.
+    credential_data = db_manager.db_get_credential(name) if STORAGE_MODE == 'db' else get_all_credentials_view().get(name)
     if not credential_data:
         raise ValueError(f"Credential '{name}' not found.")
     encrypted_secret = credential_data.get('encrypted_secret')
@@ -163,30 +282,58 @@ def get_decrypted_credentials(name: str, master_key: str) -> dict:
     return { 'api_key': credential_data.get('api_key'), 'api_secret': decrypted_secret, 'default_voice_callback_type': credential_data.get('default_voice_callback_type', ''), 'default_voice_callback_value': credential_data.get('default_voice_callback_value', '') }
 
 
+def decrypt_all_credentials(master_key: str) -> list:
+    """
+    Decrypts every stored credential with the master key, deriving the key once for the
+    whole batch. Returns a list of dicts with api_key, api_secret, account_name and
+    api_key_hint; credentials that are incomplete or fail to decrypt are skipped.
+    """
+    fernet = Fernet(get_key_from_master(master_key))
+    decrypted = []
+    for name, cred_data in get_all_credentials_view().items():
+        encrypted_secret = cred_data.get('encrypted_secret')
+        if not encrypted_secret:
+            continue
+        try:
+            decrypted_secret = decrypt_with_fernet(encrypted_secret, fernet)
+        except ValueError:
+            continue
+        decrypted.append({
+            'api_key': cred_data['api_key'],
+            'api_secret': decrypted_secret,
+            'account_name': name,
+            'api_key_hint': cred_data.get('api_key_hint', '')
+        })
+    return decrypted
+
+
 def find_and_decrypt_credential_by_groupid(groupid: str, master_key: str) -> dict:
-    # (Function unchanged, including debug logs)
+    # Success-path tracing is DEBUG-level with lazy formatting so the hot path doesn't
+    # pay for string building or handler locks in production; failures still log.
     log = logging.getLogger("system")
+    debug = log.isEnabledFor(logging.DEBUG)
     if STORAGE_MODE != 'db':
         log.error("find_and_decrypt_credential_by_groupid called while not in 'db' mode.")
         raise ValueError("This function is only available in 'db' credential storage mode.")
     if not master_key:
         log.error("find_and_decrypt_credential_by_groupid called without a master key.")
         raise ValueError("A master key is required to decrypt credentials.")
-    log.info(f"Attempting to find credential in DB for groupid: '{groupid}'")
+    if debug: log.debug("Attempting to find credential in DB for groupid: '%s'", groupid)
     credential_data = db_manager.db_find_credential_by_groupid_in_name(groupid)
     if not credential_data:
         log.warning(f"DB search returned NO results for groupid: '{groupid}'")
         raise ValueError(f"No credential found for groupid '{groupid}'.")
-    log.info(f"DB search SUCCESS for groupid '{groupid}'. Found account: '{credential_data.get('name')}'")
+    if debug: log.debug("DB search SUCCESS for groupid '%s'. Found account: '%s'", groupid, credential_data.get('name'))
     encrypted_secret = credential_data.get('encrypted_secret')
     if not encrypted_secret:
         log.error(f"Credential '{credential_data.get('name')}' is missing its encrypted_secret.")
         raise ValueError(f"Credential for groupid '{groupid}' is improperly configured.")
-    log.info(f"Found encrypted secret snippet: ...{encrypted_secret[-10:]}")
-    log.info("Attempting to decrypt secret...")
+    if debug:
+        log.debug("Found encrypted secret snippet: ...%s", encrypted_secret[-10:])
+        log.debug("Attempting to decrypt secret...")
     try:
         decrypted_secret = decrypt_data(encrypted_secret, master_key)
-        log.info("Decryption SUCCESSFUL.")
+        if debug: log.debug("Decryption SUCCESSFUL.")
     except ValueError as e:
         log.error(f"DECRYPTION FAILED for account '{credential_data.get('name')}'. This almost always means the MASTER_KEY is incorrect. Error: {e}")
         raise ValueError(f"Decryption failed for groupid '{groupid}'. The master key may be incorrect.")
@@ -198,33 +345,47 @@ def rekey_all_credentials(old_master_key: str, new_master_key: str) -> dict:
     Iterates through all credentials, decrypts them with the old key,
     and re-encrypts them with the new key.
     """
-    all_creds = get_all_credentials()
+    all_creds = get_all_credentials_view()
     results = {"success": [], "failed": []}
     updated_creds = {}
 
     if not all_creds:
         return results
 
-    for name, data in all_creds.items():
+    # Derive both keys once for the whole batch instead of once per credential.
+    old_fernet = Fernet(get_key_from_master(old_master_key))
+    new_fernet = Fernet(get_key_from_master(new_master_key))
+
+    def rekey_one(item):
+        name, data = item
         try:
             # Step 1: Decrypt with the old key
             encrypted_secret = data.get('encrypted_secret')
             if not encrypted_secret:
                 raise ValueError("Missing encrypted_secret field.")
             
-            decrypted_secret = decrypt_data(encrypted_secret, old_master_key)
+            decrypted_secret = decrypt_with_fernet(encrypted_secret, old_fernet)
 
             # Step 2: Re-encrypt with the new key
-            new_encrypted_secret = encrypt_data(decrypted_secret, new_master_key)
+            new_encrypted_secret = encrypt_with_fernet(decrypted_secret, new_fernet)
             
             # Prepare the updated entry
             updated_data = data.copy()
             updated_data['encrypted_secret'] = new_encrypted_secret
-            updated_creds[name] = updated_data
-            
-            results['success'].append(name)
+            return name, updated_data, None
         except Exception as e:
-            results['failed'].append({"name": name, "reason": str(e)})
+            return name, None, str(e)
+
+    # Fernet's AES/HMAC work happens in OpenSSL with the GIL released, so credentials
+    # are re-encrypted in parallel. map() keeps results in the original order.
+    max_workers = min(os.cpu_count() or 1, len(all_creds))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for name, updated_data, error in executor.map(rekey_one, all_creds.items()):
+            if error is None:
+                updated_creds[name] = updated_data
+                results['success'].append(name)
+            else:
+                results['failed'].append({"name": name, "reason": error})
 
     # Step 3: If there were failures, do NOT save anything to prevent data corruption.
     if results['failed']:
@@ -232,17 +393,22 @@ def rekey_all_credentials(old_master_key: str, new_master_key: str) -> dict:
 
     # Step 4: If all were successful, atomically save the updated credentials.
     if STORAGE_MODE == 'db':
-        for name, data in updated_creds.items():
-             db_manager.db_save_credential(
-                name, 
-                data['api_key'], 
-                data['encrypted_secret'], 
+        # One transaction (and one commit) for the whole batch.
+        db_manager.db_save_credentials_bulk([
+            (
+                name,
+                data['api_key'],
+                data['encrypted_secret'],
                 data['api_key_hint'],
                 data.get('default_voice_callback_type', ''),
                 data.get('default_voice_callback_value', '')
-            )
+            ) for name, data in updated_creds.items()
+        ])
     else:
         _file_save_all_credentials(updated_creds)
+
+    # Nothing is encrypted with the old master key any more; drop its derived key.
+    invalidate_key_cache(old_master_key)
         
     return results
 
@@ -1,27 +1,109 @@
 # --- START OF FILE utils/db_manager.py ---
 
 import os
+import re
 import mariadb
 import json
+from functools import lru_cache
 from threading import Lock
 
 # A lock to ensure thread safety for database operations, especially for initialization.
 db_lock = Lock()
 is_db_initialized = False
 
+# Shared connection pool, created on first use. Connections borrowed from it are
+# returned (not torn down) by conn.close(), so callers keep their existing pattern.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE") or 8)
+_pool = None
+_pool_lock = Lock()
+
+# Statement text shared by every call. Parameterized execute() goes through the binary
+# (prepared statement) protocol in a single round trip, so identical text is all the
+# server needs; cursors are not cached across calls because pooled connections are
+# reset on return, which discards server-side statement handles.
+GET_ALL_SETTINGS_SQL = "SELECT setting_key, setting_value FROM app_settings"
+SAVE_SETTING_SQL = """
+    INSERT INTO app_settings (setting_key, setting_value)
+    VALUES (?, ?)
+    ON DUPLICATE KEY UPDATE
+        setting_value = VALUES(setting_value)
+"""
+SAVE_CREDENTIAL_SQL = """
+    INSERT INTO credentials (name, api_key, encrypted_secret, api_key_hint, default_voice_callback_type, default_voice_callback_value, groupid)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON DUPLICATE KEY UPDATE
+        api_key = VALUES(api_key),
+        encrypted_secret = VALUES(encrypted_secret),
+        api_key_hint = VALUES(api_key_hint),
+        default_voice_callback_type = VALUES(default_voice_callback_type),
+        default_voice_callback_value = VALUES(default_voice_callback_value),
+        groupid = VALUES(groupid)
+"""
+# groupid isn't unique, so stop at the first matching index entry like fetchone() did.
+FIND_CREDENTIAL_BY_GROUPID_SQL = "SELECT name, api_key, encrypted_secret, default_voice_callback_type, default_voice_callback_value FROM credentials WHERE groupid = ? LIMIT 1"
+GET_CREDENTIAL_SQL = "SELECT api_key, encrypted_secret, api_key_hint, default_voice_callback_type, default_voice_callback_value FROM credentials WHERE name = ?"
+FIND_CREDENTIAL_BY_NAME_SQL = "SELECT name, api_key, encrypted_secret, default_voice_callback_type, default_voice_callback_value FROM credentials WHERE name = ? LIMIT 1"
+LIST_UNINDEXED_CREDENTIAL_NAMES_SQL = "SELECT name FROM credentials WHERE groupid IS NULL"
+SET_CREDENTIAL_GROUPID_SQL = "UPDATE credentials SET groupid = ? WHERE name = ?"
+
+# Credential names created for a group follow the "GroupId [<groupid>]" convention.
+# The bracketed id is stored in the indexed `groupid` column so lookups are a point query.
+GROUPID_IN_NAME_PATTERN = re.compile(r'GroupId \[([^\]]+)\]', re.IGNORECASE)
+
+def extract_groupid_from_name(name: str):
+    """Returns the groupid embedded in a credential name, or None if the name has none."""
+    match = GROUPID_IN_NAME_PATTERN.search(name or '')
+    groupid = match.group(1).strip() if match else None
+    # Ids that don't fit the column are left to the name-scan fallback.
+    return groupid if groupid and len(groupid) <= 64 else None
+
+@lru_cache(maxsize=256)
+def _groupid_name_pattern(groupid: str):
+    """
+    Compiles (once per groupid) the pattern used to find a groupid inside a credential name.
+    Short groupids must match as a whole word so '1' doesn't match '10'; longer ones
+    keep the original substring match for backward compatibility. Matching is
+    case-insensitive like the MariaDB REGEXP/LIKE search it replaces.
+    """
+    escaped = re.escape(groupid)
+    if len(groupid) < 3:
+        return re.compile(rf'\b{escaped}\b', re.IGNORECASE)
+    return re.compile(escaped, re.IGNORECASE)
+
+def _connection_params() -> dict:
+    return {
+        "user": os.environ.get("DB_USER"),
+        "password": os.environ.get("DB_PASSWORD"),
+        "host": os.environ.get("DB_HOST", "localhost"),
+        "port": int(os.environ.get("DB_PORT", 3306)),
+        "database": os.environ.get("DB_NAME")
+    }
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = mariadb.ConnectionPool(
+                    pool_name="carrier_config",
+                    pool_size=DB_POOL_SIZE,
+                    **_connection_params()
+                )
+    return _pool
+
 def get_db_connection():
     """
-    Establishes a connection to the MariaDB database using environment variables.
+    Borrows a connection to the MariaDB database from the shared pool.
+    Falls back to a dedicated connection if every pooled connection is in use.
     """
     try:
-        conn = mariadb.connect(
-            user=os.environ.get("DB_USER"),
-            password=os.environ.get("DB_PASSWORD"),
-            host=os.environ.get("DB_HOST", "localhost"),
-            port=int(os.environ.get("DB_PORT", 3306)),
-            database=os.environ.get("DB_NAME")
-        )
-        return conn
+        try:
+            conn = _get_pool().get_connection()
+            if conn is not None:
+                return conn
+        except mariadb.PoolError:
+            pass
+        return mariadb.connect(**_connection_params())
     except mariadb.Error as e:
         print(f"Error connecting to MariaDB Platform: {e}")
         raise e
@@ -53,8 +135,19 @@ def init_db():
             cursor.execute("""
                 ALTER TABLE credentials
                 ADD COLUMN IF NOT EXISTS default_voice_callback_type VARCHAR(255),
-                ADD COLUMN IF NOT EXISTS default_voice_callback_value VARCHAR(255)
+                ADD COLUMN IF NOT EXISTS default_voice_callback_value VARCHAR(255),
+                ADD COLUMN IF NOT EXISTS groupid VARCHAR(64)
             """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_credentials_groupid ON credentials (groupid)")
+
+            # Backfill the groupid column for rows saved before it existed.
+            cursor.execute(LIST_UNINDEXED_CREDENTIAL_NAMES_SQL)
+            backfill = [
+                (groupid, name) for (name,) in cursor.fetchall()
+                if (groupid := extract_groupid_from_name(name))
+            ]
+            if backfill:
+                cursor.executemany(SET_CREDENTIAL_GROUPID_SQL, backfill)
             
             # --- START: MODIFICATION (Add App Settings Table) ---
             cursor.execute("""
@@ -76,41 +169,44 @@ def init_db():
 
 # --- START: MODIFICATION (New Functions for App Settings) ---
 
-def db_get_all_settings() -> dict:
-    """Loads all key-value settings from the app_settings table."""
+def db_get_all_settings():
+    """
+    Loads all key-value settings from the app_settings table in one query.
+    Returns None if the database can't be read, so callers can tell that apart from no stored settings.
+    """
     conn = None
-    settings = {}
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT setting_key, setting_value FROM app_settings")
-        for row in cursor:
-            settings[row['setting_key']] = row['setting_value']
-        return settings
+        cursor = conn.cursor()
+        cursor.execute(GET_ALL_SETTINGS_SQL)
+        return dict(cursor.fetchall()) # (key, value) rows; no per-row dict needed
     except mariadb.Error as e:
         print(f"Error fetching all app settings from DB: {e}")
-        return {}
+        return None
     finally:
         if conn:
             conn.close()
 
-def db_save_setting(key: str, value: str):
-    """Saves or updates a single setting in the app_settings table (upsert)."""
+def db_save_settings(settings: dict):
+    """
+    Saves or updates several settings in a single transaction (upsert).
+    Either every setting is written or none are.
+    """
+    if not settings:
+        return
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        query = """
-            INSERT INTO app_settings (setting_key, setting_value)
-            VALUES (?, ?)
-            ON DUPLICATE KEY UPDATE
-                setting_value = VALUES(setting_value)
-        """
-        cursor.execute(query, (key, str(value) if value is not None else None))
+        cursor.executemany(SAVE_SETTING_SQL, [
+            (key, str(value) if value is not None else None) for key, value in settings.items()
+        ])
         conn.commit()
     except mariadb.Error as e:
-        print(f"Error saving setting '{key}' to DB: {e}")
-        raise ValueError(f"Failed to save setting '{key}' to the database.") from e
+        print(f"Error saving {len(settings)} settings to DB: {e}")
+        if conn:
+            conn.rollback()
+        raise ValueError("Failed to save settings to the database. No changes were saved.") from e
     finally:
         if conn:
             conn.close()
@@ -147,23 +243,32 @@ def db_get_all_credentials():
         if conn:
             conn.close()
 
+def db_get_credential(name: str):
+    """Loads a single credential by its name, or returns None if it doesn't exist."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(GET_CREDENTIAL_SQL, (name,))
+        return cursor.fetchone()
+    except mariadb.Error as e:
+        print(f"Error fetching credential '{name}' from DB: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
 def db_save_credential(name: str, api_key: str, encrypted_secret: str, api_key_hint: str, voice_callback_type: str, voice_callback_value: str):
     """Saves or updates a credential in the database, including the new default settings."""
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        query = """
-            INSERT INTO credentials (name, api_key, encrypted_secret, api_key_hint, default_voice_callback_type, default_voice_callback_value)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON DUPLICATE KEY UPDATE
-                api_key = VALUES(api_key),
-                encrypted_secret = VALUES(encrypted_secret),
-                api_key_hint = VALUES(api_key_hint),
-                default_voice_callback_type = VALUES(default_voice_callback_type),
-                default_voice_callback_value = VALUES(default_voice_callback_value)
-        """
-        cursor.execute(query, (name, api_key, encrypted_secret, api_key_hint, voice_callback_type or '', voice_callback_value or ''))
+        cursor.execute(SAVE_CREDENTIAL_SQL, (
+            name, api_key, encrypted_secret, api_key_hint,
+            voice_callback_type or '', voice_callback_value or '',
+            extract_groupid_from_name(name)
+        ))
         conn.commit()
     except mariadb.Error as e:
         print(f"Error saving credential '{name}' to DB: {e}")
@@ -172,6 +277,35 @@ def db_save_credential(name: str, api_key: str, encrypted_secret: str, api_key_h
         if conn:
             conn.close()
 
+def db_save_credentials_bulk(rows: list):
+    """
+    Saves or updates many credentials in a single transaction.
+    Each row is (name, api_key, encrypted_secret, api_key_hint, voice_callback_type, voice_callback_value).
+    Either every row is written or none are.
+    """
+    if not rows:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.executemany(SAVE_CREDENTIAL_SQL, [
+            (
+                name, api_key, encrypted_secret, api_key_hint,
+                voice_callback_type or '', voice_callback_value or '',
+                extract_groupid_from_name(name)
+            ) for name, api_key, encrypted_secret, api_key_hint, voice_callback_type, voice_callback_value in rows
+        ])
+        conn.commit()
+    except mariadb.Error as e:
+        print(f"Error saving {len(rows)} credentials to DB: {e}")
+        if conn:
+            conn.rollback()
+        raise ValueError("Failed to save credentials to the database. No changes were saved.") from e
+    finally:
+        if conn:
+            conn.close()
+
 def db_delete_credential(name: str) -> bool:
     """Deletes a credential from the database by its name."""
     conn = None
@@ -188,9 +322,25 @@ def db_delete_credential(name: str) -> bool:
         if conn:
             conn.close()
 
+def _found_credential(row):
+    """Builds the lookup result from a positional (tuple cursor) row."""
+    if row is None:
+        return None
+    name, api_key, encrypted_secret, cb_type, cb_value = row
+    return {
+        'name': name,
+        'api_key': api_key,
+        'encrypted_secret': encrypted_secret,
+        'default_voice_callback_type': cb_type,
+        'default_voice_callback_value': cb_value
+    }
+
 def db_find_credential_by_groupid_in_name(groupid: str):
     """
     Finds a credential by its groupid within the credential name.
+    - First tries an exact match on the indexed `groupid` column. Credentials with an indexed
+      groupid only ever match exactly; they are not considered by the name fallback.
+    - Falls back to matching names in-process, only for credentials without an indexed groupid (`groupid IS NULL`):
     - If the groupid is less than 3 characters, it performs a whole-word search to avoid partial matches (e.g., '1' matching '10').
     - Otherwise, it performs a broad substring search for backward compatibility.
     """
@@ -200,24 +350,25 @@ def db_find_credential_by_groupid_in_name(groupid: str):
         
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        # Plain tuple cursor: this runs on every inbound request, so skip per-row dict building.
+        cursor = conn.cursor()
 
-        # --- START: MODIFICATION ---
-        if len(groupid) < 3:
-            # Use REGEXP for a "whole word" search to find the exact number.
-            # This prevents '1' from matching '10', '11', etc. in names like "GroupId [10]".
-            # '[[:<:]]' and '[[:>:]]' are word boundaries in MariaDB/MySQL REGEXP.
-            query = "SELECT name, api_key, encrypted_secret, default_voice_callback_type, default_voice_callback_value FROM credentials WHERE name REGEXP ?"
-            search_pattern = f"[[:<:]]{groupid}[[:>:]]"
-        else:
-            # For longer, more unique groupids, the original substring search is acceptable.
-            query = "SELECT name, api_key, encrypted_secret, default_voice_callback_type, default_voice_callback_value FROM credentials WHERE name LIKE ?"
-            search_pattern = f"%{groupid}%"
-        # --- END: MODIFICATION ---
-
-        cursor.execute(query, (search_pattern,))
+        cursor.execute(FIND_CREDENTIAL_BY_GROUPID_SQL, (groupid,))
         result = cursor.fetchone()
-        return result
+        if result:
+            return _found_credential(result)
+
+        # Only rows without an indexed groupid can still match by name. Match them with a
+        # precompiled pattern here instead of a per-row REGEXP/LIKE on the server, then
+        # fetch the winning row through the unique name index.
+        pattern = _groupid_name_pattern(groupid)
+        cursor.execute(LIST_UNINDEXED_CREDENTIAL_NAMES_SQL)
+        matched_name = next((name for (name,) in cursor.fetchall() if pattern.search(name)), None)
+        if matched_name is None:
+            return None
+
+        cursor.execute(FIND_CREDENTIAL_BY_NAME_SQL, (matched_name,))
+        return _found_credential(cursor.fetchone())
     except mariadb.Error as e:
         print(f"Error finding credential by groupid '{groupid}' in name: {e}")
         return None
@@ -2,9 +2,9 @@
 
 import os
 import base64
+import hashlib
+from threading import Lock
 from cryptography.fernet import Fernet, InvalidToken
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 # --- START: MODIFICATION (Read Salt from Environment) ---
 
@@ -18,47 +18,112 @@ SALT = SALT_FROM_ENV.encode()
 
 # --- END: MODIFICATION ---
 
+# Key derivation function. 'pbkdf2' (default) is what every existing deployment uses;
+# 'argon2id' is cheaper per derivation for the same brute-force resistance. Changing it
+# changes every derived key, so credentials saved under the other setting must be re-saved.
+KDF_ALGO = (os.environ.get('KDF_ALGO') or 'pbkdf2').strip().lower()
+if KDF_ALGO == 'argon2id':
+    try:
+        from argon2.low_level import hash_secret_raw, Type
+    except ImportError:
+        raise RuntimeError("CRITICAL: KDF_ALGO is 'argon2id' but the argon2-cffi package is not installed.")
+elif KDF_ALGO != 'pbkdf2':
+    raise RuntimeError(f"CRITICAL: Unsupported KDF_ALGO '{KDF_ALGO}'. Use 'pbkdf2' or 'argon2id'.")
+
+# Derived keys are cached so the 480k-iteration KDF runs once per master key rather than
+# on every encrypt/decrypt. Entries are keyed by a salted BLAKE2b digest of the master key
+# so the raw master key is never held in the cache.
+MAX_CACHED_KEYS = 8
+_derived_key_cache = {}
+_derived_key_cache_lock = Lock()
+
+# One Fernet instance per derived key, shared across requests. Fernet holds no per-call
+# state, so a single instance is safe to use from multiple threads.
+_fernet_cache: dict[bytes, Fernet] = {}
+
+
+def _master_key_digest(master_key: str) -> bytes:
+    return hashlib.blake2b(master_key.encode(), key=SALT[:64], digest_size=16).digest()
+
 
 def get_key_from_master(master_key: str) -> bytes:
     """
     Derives a cryptographically strong key from the user-provided master key and the application's salt.
+    Results are cached per master key.
     """
     if not master_key:
         raise ValueError("A master key is required.")
-    
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=SALT,
-        iterations=480000, # Increased iterations for better security
-    )
-    key = base64.urlsafe_b64encode(kdf.derive(master_key.encode()))
+
+    digest = _master_key_digest(master_key)
+    with _derived_key_cache_lock:
+        key = _derived_key_cache.get(digest)
+    if key is not None:
+        return key
+
+    if KDF_ALGO == 'argon2id':
+        derived = hash_secret_raw(
+            master_key.encode(), SALT,
+            time_cost=2, memory_cost=19456, parallelism=1, hash_len=32, type=Type.ID
+        )
+    else:
+        # PBKDF2-HMAC-SHA256 via the stdlib (OpenSSL); output is identical to cryptography's PBKDF2HMAC.
+        derived = hashlib.pbkdf2_hmac('sha256', master_key.encode(), SALT, 480000, 32) # Increased iterations for better security
+    key = base64.urlsafe_b64encode(derived)
+
+    with _derived_key_cache_lock:
+        if len(_derived_key_cache) >= MAX_CACHED_KEYS:
+            # Evict the oldest entry (dicts preserve insertion order)
+            evicted = _derived_key_cache.pop(next(iter(_derived_key_cache)))
+            _fernet_cache.pop(evicted, None)
+        _derived_key_cache[digest] = key
     return key
 
 
-def encrypt_data(data: str, master_key: str) -> str:
+def invalidate_key_cache(master_key: str = None):
     """
-    Encrypts a string using a key derived from the master key.
+    Drops the cached derived key for a master key, or every cached key if none is given.
+    """
+    with _derived_key_cache_lock:
+        if master_key:
+            key = _derived_key_cache.pop(_master_key_digest(master_key), None)
+            _fernet_cache.pop(key, None)
+        else:
+            _derived_key_cache.clear()
+            _fernet_cache.clear()
+
+
+def _get_fernet(master_key: str) -> Fernet:
+    """
+    Returns the shared Fernet instance for a master key, building it on first use.
+    """
+    key = get_key_from_master(master_key)
+    f = _fernet_cache.get(key)
+    if f is None:
+        f = Fernet(key)
+        with _derived_key_cache_lock:
+            # Don't resurrect an entry for a key that was evicted while we built it.
+            if key in _derived_key_cache.values():
+                f = _fernet_cache.setdefault(key, f)
+    return f
+
+
+def encrypt_with_fernet(data: str, f: Fernet) -> str:
+    """
+    Encrypts a string with an already-constructed Fernet instance.
+    Use this when encrypting many values under the same master key.
     """
     if not data:
         raise ValueError("Data to encrypt cannot be empty.")
-    
-    key = get_key_from_master(master_key)
-    f = Fernet(key)
-    encrypted_data = f.encrypt(data.encode())
-    return encrypted_data.decode()
+    return f.encrypt(data.encode()).decode()
 
 
-def decrypt_data(encrypted_data: str, master_key: str) -> str:
+def decrypt_with_fernet(encrypted_data: str, f: Fernet) -> str:
     """
-    Decrypts a string using a key derived from the master key.
+    Decrypts a string with an already-constructed Fernet instance.
     Raises ValueError on failure.
     """
     if not encrypted_data:
         raise ValueError("Encrypted data cannot be empty.")
-        
-    key = get_key_from_master(master_key)
-    f = Fernet(key)
     try:
         decrypted_data = f.decrypt(encrypted_data.encode())
         return decrypted_data.decode()
@@ -70,6 +135,25 @@ def decrypt_data(encrypted_data: str, master_key: str) -> str:
         # Catch any other potential crypto errors
         raise ValueError(f"An unexpected decryption error occurred: {e}")
 
+
+def encrypt_data(data: str, master_key: str) -> str:
+    """
+    Encrypts a string using a key derived from the master key.
+    """
+    if not data:
+        raise ValueError("Data to encrypt cannot be empty.")
+    return encrypt_with_fernet(data, _get_fernet(master_key))
+
+
+def decrypt_data(encrypted_data: str, master_key: str) -> str:
+    """
+    Decrypts a string using a key derived from the master key.
+    Raises ValueError on failure.
+    """
+    if not encrypted_data:
+        raise ValueError("Encrypted data cannot be empty.")
+    return decrypt_with_fernet(encrypted_data, _get_fernet(master_key))
+
 # --- We no longer need the file-based salt functions, so they have been removed. ---
 
 # --- END OF FILE utils/encryption.py ---
\ No newline at end of file
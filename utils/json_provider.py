@@ -0,0 +1,28 @@
+# --- START OF FILE utils/json_provider.py ---
+import orjson
+from flask.json.provider import JSONProvider
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson, so request.get_json() and jsonify() in every
+    blueprint parse and serialize with orjson instead of the stdlib json module.
+    Values orjson can't handle natively are serialized via str(), like the API logs.
+    """
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        # orjson.JSONDecodeError is a ValueError, so Flask's bad-request handling still applies.
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # The bytes go straight into the response body, skipping a decode/encode round trip.
+        return self._app.response_class(
+            orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS), mimetype=self.mimetype
+        )
+
+# --- END OF FILE utils/json_provider.py ---
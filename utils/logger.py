@@ -1,11 +1,61 @@
 # --- START OF FILE utils/logger.py ---
 
 import os
+import atexit
+import queue
 import logging
-from logging.handlers import RotatingFileHandler
-import json
-import copy # Import the copy module for deep copying request details
-from fastapi import Request # Import for type hinting
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import orjson
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Only for type hints: the Flask UI imports this module too and shouldn't load FastAPI.
+    from fastapi import Request
+
+
+def _dumps(obj) -> str:
+    """
+    Serializes a log entry as one compact JSON line with orjson. Values it can't
+    handle natively are logged via str() and non-string keys are allowed, so
+    logging never fails on an unusual request or response object.
+    """
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+# Log records are put on a queue and written to their files by one background thread,
+# so request threads never block on file writes, flushes or rotation. Each logger gets a
+# QueueHandler that tags records with its name; the listener hands them to that logger's
+# real handlers.
+_log_queue = queue.SimpleQueue()
+_queued_handlers = {}
+
+class _TargetedQueueHandler(QueueHandler):
+    """Enqueues records tagged with the logger whose handlers should write them."""
+    def __init__(self, target: str):
+        super().__init__(_log_queue)
+        self.target = target
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.queue_target = self.target
+        return record
+
+class _QueueDispatcher(logging.Handler):
+    """Runs on the listener thread and passes each record to its target's handlers."""
+    def handle(self, record):
+        for handler in _queued_handlers.get(record.queue_target, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+_log_listener = QueueListener(_log_queue, _QueueDispatcher())
+_log_listener.start()
+atexit.register(_log_listener.stop) # Flushes anything still queued on shutdown
+
+def _attach_queued_handlers(logger: logging.Logger, *handlers: logging.Handler):
+    """Routes the logger's records through the queue to the given handlers."""
+    _queued_handlers[logger.name] = handlers
+    logger.addHandler(_TargetedQueueHandler(logger.name))
 
 def setup_logging():
     """
@@ -29,24 +79,52 @@ def setup_logging():
             backupCount=3
         )
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
         
         # Console handler
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
+        _attach_queued_handlers(root_logger, file_handler, console_handler)
 
         root_logger.info("System logging configured.")
 
+class _NonAlnumDeleteTable(dict):
+    """
+    str.translate() table that deletes every non-alphanumeric character. Entries are
+    filled in on first sight, so it stays small while matching str.isalnum() exactly.
+    """
+    def __missing__(self, codepoint):
+        value = codepoint if chr(codepoint).isalnum() else None
+        self[codepoint] = value
+        return value
+
+_FILENAME_TABLE = _NonAlnumDeleteTable()
+
+# Configured per-account loggers. A warm lookup is a plain dict hit, so the hot path
+# doesn't take logging's module lock in getLogger() on every API log write.
+_account_loggers = {}
+_account_loggers_lock = threading.Lock()
+
 def _get_account_logger(account_id: str) -> logging.Logger:
     """
     Gets a specific logger for a given account_id.
     If the logger doesn't have a file handler, it creates one.
     This ensures each account logs to its own file.
     """
+    logger = _account_loggers.get(account_id)
+    if logger is not None:
+        return logger
+
+    with _account_loggers_lock:
+        logger = _account_loggers.get(account_id)
+        if logger is None:
+            logger = _configure_account_logger(account_id)
+            _account_loggers[account_id] = logger
+    return logger
+
+def _configure_account_logger(account_id: str) -> logging.Logger:
     log_dir = 'logs'
     # Sanitize account_id to be a valid filename
-    safe_filename = "".join([c for c in account_id if c.isalnum()]) + ".log"
+    safe_filename = account_id.translate(_FILENAME_TABLE) + ".log"
     log_path = os.path.join(log_dir, safe_filename)
 
     logger = logging.getLogger(account_id)
@@ -60,7 +138,7 @@ def _get_account_logger(account_id: str) -> logging.Logger:
         handler = RotatingFileHandler(log_path, maxBytes=1024 * 1024 * 5, backupCount=5)
         formatter = logging.Formatter('%(asctime)s - %(message)s')
         handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        _attach_queued_handlers(logger, handler)
         
     return logger
 
@@ -82,30 +160,36 @@ def get_notification_logger() -> logging.Logger:
         handler = RotatingFileHandler(log_path, maxBytes=1024 * 1024 * 2, backupCount=3)
         formatter = logging.Formatter('%(asctime)s - %(message)s')
         handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        _attach_queued_handlers(logger, handler)
         
     return logger
 # --- END: MODIFICATION ---
 
+# Keys whose values are masked in incoming request payloads and in outgoing API request payloads.
+_SENSITIVE_KEYS = frozenset({'master_key', 'api_key', 'api_secret', 'secret', 'password', 'old_master_key', 'new_master_key'})
+_SENSITIVE_API_PAYLOAD_KEYS = frozenset({'password', 'api_secret', 'secret'})
+
 def _obfuscate_payload(payload: dict) -> dict:
     """
-    Takes a payload dictionary, deep copies it, and obfuscates common sensitive keys.
+    Returns a shallow copy of a payload dictionary with common sensitive keys obfuscated.
+    Only top-level values are replaced, so nested values are shared, not copied.
+    A payload with no sensitive keys is returned as-is.
     """
-    loggable_payload = copy.deepcopy(payload)
-    sensitive_keys = ['master_key', 'api_key', 'api_secret', 'secret', 'password', 'old_master_key', 'new_master_key']
+    if not _SENSITIVE_KEYS.intersection(payload):
+        return payload
 
-    for key, value in loggable_payload.items():
-        if key in sensitive_keys and isinstance(value, str) and value:
-            loggable_payload[key] = f"***{value[-4:]}" if len(value) > 4 else "***"
-    
-    return loggable_payload
+    return {
+        key: (f"***{value[-4:]}" if len(value) > 4 else "***")
+        if key in _SENSITIVE_KEYS and isinstance(value, str) and value else value
+        for key, value in payload.items()
+    }
 
 def _obfuscate_credentials(request_details: dict) -> dict:
     """
-    Takes a request details dictionary, deep copies it, and obfuscates credentials.
+    Returns a copy of a request details dictionary with credentials obfuscated.
+    Only the top level and the Payload dict are copied; the original is never modified.
     """
-    # Create a deep copy to avoid modifying the original object
-    loggable_details = copy.deepcopy(request_details)
+    loggable_details = dict(request_details)
 
     if "Auth" in loggable_details and isinstance(loggable_details["Auth"], (list, tuple)) and len(loggable_details["Auth"]) == 2:
         key, secret = loggable_details["Auth"]
@@ -115,20 +199,23 @@ def _obfuscate_credentials(request_details: dict) -> dict:
 
     # Also check for plaintext 'password' or 'api_secret' in payload
     if "Payload" in loggable_details and isinstance(loggable_details["Payload"], dict):
-        for key in ['password', 'api_secret', 'secret']:
-            if key in loggable_details["Payload"]:
+        sensitive_in_payload = _SENSITIVE_API_PAYLOAD_KEYS.intersection(loggable_details["Payload"])
+        if sensitive_in_payload:
+            loggable_details["Payload"] = dict(loggable_details["Payload"])
+            for key in sensitive_in_payload:
                 secret = loggable_details["Payload"][key]
                 loggable_details["Payload"][key] = f"***{secret[-4:]}" if len(secret) > 4 else "***"
 
     return loggable_details
 
-def log_incoming_request(request: Request, payload: dict):
+def log_incoming_request(request: "Request", payload: dict):
     """
     Logs an incoming FastAPI request to the main system log.
     """
+    system_logger = logging.getLogger() # Get the root logger
+    if not system_logger.isEnabledFor(logging.INFO):
+        return
     try:
-        system_logger = logging.getLogger() # Get the root logger
-        
         log_entry = {
             "event_type": "IncomingFastAPIRequest",
             "client_ip": request.client.host,
@@ -136,7 +223,7 @@ def log_incoming_request(request: Request, payload: dict):
             "path": request.url.path,
             "payload": _obfuscate_payload(payload)
         }
-        system_logger.info(json.dumps(log_entry))
+        system_logger.info(_dumps(log_entry))
     except Exception as e:
         system_logger = logging.getLogger("system")
         system_logger.error(f"Failed to write incoming request log: {e}")
@@ -150,8 +237,16 @@ def log_request_response(operation_name, request_details, response_data, status_
         logging.getLogger("system").error("log_request_response called without an account_id.")
         return
 
+    _write_api_log(operation_name, request_details, response_data, status_code, account_id)
+
+
+def _write_api_log(operation_name, request_details, response_data, status_code, account_id):
+    """Writes a single obfuscated request/response entry to the account's log file."""
     try:
         logger = _get_account_logger(account_id)
+        # Nothing below is needed if the record would be dropped anyway.
+        if not logger.isEnabledFor(logging.INFO):
+            return
         
         # Obfuscate credentials before logging
         loggable_request = _obfuscate_credentials(request_details)
@@ -162,7 +257,7 @@ def log_request_response(operation_name, request_details, response_data, status_
             "request": loggable_request,
             "response": response_data
         }
-        logger.info(json.dumps(log_entry, indent=2))
+        logger.info(_dumps(log_entry))
     except Exception as e:
         # Log failure to the general system logger
         system_logger = logging.getLogger("system")
@@ -173,12 +268,16 @@ def clear_logs():
     """Clears all .log files from the logs directory."""
     log_dir = 'logs'
     try:
-        if os.path.isdir(log_dir):
-            for filename in os.listdir(log_dir):
-                if filename.endswith(".log"):
-                    os.remove(os.path.join(log_dir, filename))
-            logging.getLogger("system").info("All log files cleared.")
-            return True
+        with os.scandir(log_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".log") and entry.is_file(follow_symlinks=False):
+                    try:
+                        os.unlink(entry.path)
+                    except FileNotFoundError:
+                        pass # Already gone (e.g. removed by a concurrent rotation)
+        logging.getLogger("system").info("All log files cleared.")
+        return True
+    except (FileNotFoundError, NotADirectoryError):
         return False
     except Exception as e:
         logging.getLogger("system").error(f"Error clearing log files: {e}")
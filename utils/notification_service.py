@@ -1,54 +1,128 @@
 
 
 import asyncio
+import atexit
 import httpx
 import hmac
 import hashlib
 import json
+import logging
+import orjson
 import threading
 from datetime import datetime, timezone
+from types import MappingProxyType
+from urllib.parse import urlencode
 
 from . import settings_manager
 
 from . import logger # Import the logger module
 
+# Operational messages (sent/skipped/failed). Full request/response records go to the
+# notifications log via logger.get_notification_logger().
+_log = logging.getLogger("notification_service")
+
+# The setting that enables each event type.
+EVENT_SETTING_MAP = MappingProxyType({
+    "subaccount.created": "notifications_on_subaccount_created",
+    "did.provisioned": "notifications_on_did_provisioned",
+    "did.released": "notifications_on_did_released",
+    "did.transferred": "notifications_on_did_transferred",
+    "test.event": "notifications_enabled"
+})
+
+# Webhooks are sent from one long-lived event loop running in a background thread, so a
+# single httpx.AsyncClient (and its keep-alive connection pool) is reused across
+# notifications instead of paying a new TCP/TLS handshake for every event.
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name="notification-loop", daemon=True).start()
+_client = None
+
+# Caps how many notifications can be queued or in flight on the loop at once. A burst past
+# this (e.g. a large batch release while the webhook endpoint is hanging) drops the extra
+# notifications with an error instead of piling up coroutines without bound.
+MAX_PENDING_NOTIFICATIONS = 1024
+_pending_slots = threading.BoundedSemaphore(MAX_PENDING_NOTIFICATIONS)
+
+# (secret, HMAC keyed with it). The signing secret rarely changes, so the keyed HMAC is
+# built once and copied per webhook instead of re-deriving the inner/outer pads every time.
+# Only touched from the notification loop thread.
+_hmac_base = None
+
+
+def _sign(secret: str, message: bytes) -> str:
+    """Returns the hex HMAC-SHA256 signature of message under secret."""
+    global _hmac_base
+    if _hmac_base is None or _hmac_base[0] != secret:
+        _hmac_base = (secret, hmac.new(secret.encode('utf-8'), None, hashlib.sha256))
+    signature_hash = _hmac_base[1].copy()
+    signature_hash.update(message)
+    return signature_hash.hexdigest()
+
+
+def _form_value(value) -> str:
+    """Converts a form field value to text the same way httpx's form encoder does."""
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if value is None:
+        return ''
+    return str(value)
+
+
+def _encode_form(fields: dict) -> bytes:
+    """URL-encodes form fields, repeating the key for list/tuple values like httpx does."""
+    pairs = []
+    for key, value in fields.items():
+        if isinstance(value, (list, tuple)):
+            pairs.extend((key, _form_value(item)) for item in value)
+        else:
+            pairs.append((key, _form_value(value)))
+    return urlencode(pairs).encode('utf-8')
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Returns the shared webhook client. Only call this from the notification loop."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30))
+    return _client
+
 
 async def send_notification(event_type: str, data: dict):
     """
     Constructs and sends a webhook notification based on global settings.
     Checks both the master switch and event-specific switches before sending.
     Supports both JSON and flattened form-urlencoded content types.
+    Runs on the notification loop; use fire_and_forget() to schedule it.
     """
+    event_key = EVENT_SETTING_MAP.get(event_type)
 
-    notification_logger = logger.get_notification_logger()
-
+    # One consistent read of everything this notification needs.
+    settings = settings_manager.get_settings([
+        'notifications_enabled', 'notifications_webhook_url',
+        'notifications_secret', 'notifications_content_type',
+        *([event_key] if event_key else [])
+    ])
 
-    if not settings_manager.get_setting('notifications_enabled'):
+    if not settings['notifications_enabled']:
         return
-
-    event_setting_map = {
-        "subaccount.created": "notifications_on_subaccount_created",
-        "did.provisioned": "notifications_on_did_provisioned",
-        "did.released": "notifications_on_did_released",
-        "did.transferred": "notifications_on_did_transferred",
-        "test.event": "notifications_enabled"
-    }
     
-    event_key = event_setting_map.get(event_type)
-    
-    if not event_key or not settings_manager.get_setting(event_key):
-        # Using print for cli feedback, but not logging as it's an intentional skip
-        print(f"Notification Service: Skipping event '{event_type}' as it is disabled in settings.")
+    if not event_key or not settings[event_key]:
+        # An intentional skip, so only visible at DEBUG
+        _log.debug("Notification Service: Skipping event '%s' as it is disabled in settings.", event_type)
         return
 
-    webhook_url = settings_manager.get_setting('notifications_webhook_url')
+    webhook_url = settings['notifications_webhook_url']
     if not webhook_url:
-        # Using print for cli feedback, but not logging as it's a config issue
-        print(f"Notification Service: Aborting send for '{event_type}'. Webhook URL is not configured.")
+        _log.warning("Notification Service: Aborting send for '%s'. Webhook URL is not configured.", event_type)
         return
 
-    secret = settings_manager.get_setting('notifications_secret')
-    content_type = settings_manager.get_setting('notifications_content_type', 'application/json')
+    # Everything below only runs once we know the notification will actually be sent.
+    notification_logger = logger.get_notification_logger()
+
+    secret = settings['notifications_secret']
+    content_type = settings['notifications_content_type'] or 'application/json'
 
     payload = {
         'event_type': event_type,
@@ -56,37 +130,33 @@ async def send_notification(event_type: str, data: dict):
         'data': data
     }
     
-    headers = {}
-    request_kwargs = {'timeout': 10.0}
-    payload_for_signing = None
-    final_payload_sent = {}
-
     if content_type == 'application/x-www-form-urlencoded':
         flat_form_data = {
             'event_type': payload['event_type'],
             'timestamp': payload['timestamp'],
             **payload['data']
         }
-        request_kwargs['data'] = flat_form_data
+        # Encoded once here and sent as the raw body, so httpx doesn't re-encode the form.
+        body = _encode_form(flat_form_data)
         final_payload_sent = flat_form_data
-        
-        if secret:
-            payload_for_signing = json.dumps(payload).encode('utf-8')
+        # Form receivers rebuild the JSON to verify the signature, so this must stay byte-for-byte
+        # what json.dumps produces (", "/": " separators, non-ASCII escaped), not orjson's output.
+        payload_for_signing = json.dumps(payload).encode('utf-8') if secret else None
     else: # Default to application/json
-        json_payload_bytes = json.dumps(payload).encode('utf-8')
-        headers['Content-Type'] = 'application/json'
-        request_kwargs['content'] = json_payload_bytes
+        content_type = 'application/json'
+        body = orjson.dumps(payload)
         final_payload_sent = payload
-        if secret:
-            payload_for_signing = json_payload_bytes
+        payload_for_signing = body
 
-    if secret and payload_for_signing:
-        signature_hash = hmac.new(secret.encode('utf-8'), payload_for_signing, hashlib.sha256)
-        signature = signature_hash.hexdigest()
-        headers['X-Webhook-Signature-256'] = f"sha256={signature}"
-    
-    request_kwargs['headers'] = headers
+    if secret:
+        headers = {
+            'Content-Type': content_type,
+            'X-Webhook-Signature-256': f"sha256={_sign(secret, payload_for_signing)}"
+        }
+    else:
+        headers = {'Content-Type': content_type}
 
+    request_kwargs = {'timeout': 10.0, 'headers': headers, 'content': body}
 
     log_entry = {
         "event_type": event_type,
@@ -99,40 +169,63 @@ async def send_notification(event_type: str, data: dict):
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(webhook_url, **request_kwargs)
-            
-            log_entry["response"] = {
-                "status_code": response.status_code,
-                "headers": dict(response.headers),
-                "body": response.text
-            }
-            
-            response.raise_for_status() 
-            notification_logger.info(json.dumps(log_entry))
-            print(f"Notification Sent: Event '{event_type}' to {webhook_url} as {content_type}. Status: {response.status_code}")
+        response = await _get_client().post(webhook_url, **request_kwargs)
+        
+        log_entry["response"] = {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "body": response.text
+        }
+        
+        response.raise_for_status() 
+        notification_logger.info(orjson.dumps(log_entry).decode())
+        _log.info("Notification Sent: Event '%s' to %s as %s. Status: %s", event_type, webhook_url, content_type, response.status_code)
 
     except httpx.RequestError as e:
         log_entry["response"] = {"error": f"RequestError: {str(e)}"}
-        notification_logger.error(json.dumps(log_entry))
-        print(f"Notification Error: Failed to send event '{event_type}' to {webhook_url}. Details: {e}")
+        notification_logger.error(orjson.dumps(log_entry).decode())
+        _log.error("Notification Error: Failed to send event '%s' to %s. Details: %s", event_type, webhook_url, e)
     except Exception as e:
         log_entry["response"] = {"error": f"UnexpectedError: {str(e)}"}
-        notification_logger.error(json.dumps(log_entry))
-        print(f"Notification Error: An unexpected error occurred while sending webhook. Details: {e}")
+        notification_logger.error(orjson.dumps(log_entry).decode())
+        _log.error("Notification Error: An unexpected error occurred while sending webhook. Details: %s", e)
     
 
 
-def _run_async_in_thread(coro):
-    """Helper function to run an async coroutine in a new event loop."""
-    asyncio.run(coro)
+def _report_failure(future):
+    """Frees the notification's pending slot and surfaces errors raised outside send_notification's own error handling."""
+    _pending_slots.release()
+    if not future.cancelled() and future.exception() is not None:
+        _log.error("Notification Error: Background notification task failed. Details: %s", future.exception())
 
 def fire_and_forget(event_type: str, data: dict):
     """
-    Synchronous wrapper that starts the async notification in a separate background thread.
+    Synchronous wrapper that schedules the async notification on the background notification loop.
     """
-    coroutine = send_notification(event_type, data)
-    thread = threading.Thread(target=_run_async_in_thread, args=(coroutine,))
-    thread.daemon = True
-    thread.start()
+    # With notifications off (the default) skip creating and scheduling the coroutine at all.
+    if not settings_manager.get_setting('notifications_enabled'):
+        return
+    if not _pending_slots.acquire(blocking=False):
+        _log.error("Notification Error: Dropping event '%s'; %d notifications are already pending.", event_type, MAX_PENDING_NOTIFICATIONS)
+        return
+    future = asyncio.run_coroutine_threadsafe(send_notification(event_type, data), _loop)
+    future.add_done_callback(_report_failure)
+
+
+async def _drain(timeout: float):
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    if pending:
+        await asyncio.wait(pending, timeout=timeout)
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+
+@atexit.register
+def _shutdown():
+    """Gives in-flight webhooks a few seconds to finish, then closes the client and stops the loop."""
+    try:
+        asyncio.run_coroutine_threadsafe(_drain(5.0), _loop).result(timeout=10)
+    except Exception as e:
+        _log.warning("Notification Service: Shutdown did not complete cleanly. Details: %s", e)
+    finally:
+        _loop.call_soon_threadsafe(_loop.stop)
 
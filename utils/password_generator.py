@@ -1,7 +1,24 @@
 # --- START OF FILE utils/password_generator.py ---
+import os
 import secrets
 import string
 
+_ALPHABET = string.ascii_letters + string.digits
+_REQUIRED_CLASSES = (string.ascii_lowercase, string.ascii_uppercase, string.digits)
+_rng = secrets.SystemRandom()
+# Bytes at or above this would make byte % len(_ALPHABET) favour the first characters.
+_UNBIASED_LIMIT = 256 - 256 % len(_ALPHABET)
+
+def _random_alphabet_chars(count):
+    """
+    Draws count uniformly random characters from _ALPHABET with one os.urandom call
+    (rarely more), instead of one call per character. Out-of-range bytes are rejected.
+    """
+    chars = []
+    while len(chars) < count:
+        chars.extend(_ALPHABET[b % len(_ALPHABET)] for b in os.urandom(count + 8) if b < _UNBIASED_LIMIT)
+    return chars[:count]
+
 def generate_secure_secret(length=16):
     """
     Generates a cryptographically secure random string suitable for API secrets.
@@ -10,15 +27,14 @@ def generate_secure_secret(length=16):
     - At least one uppercase letter
     - At least one lowercase letter
     - At least one digit
+    One character of each required class is drawn first and the rest from the full
+    alphabet, then the result is shuffled, so no retries are needed.
     """
-    alphabet = string.ascii_letters + string.digits
-    
-    while True:
-        password = ''.join(secrets.choice(alphabet) for i in range(length))
-        
-        # Verify complexity requirements
-        if (any(c.islower() for c in password)
-                and any(c.isupper() for c in password)
-                and any(c.isdigit() for c in password)):
-            return password
+    if length < len(_REQUIRED_CLASSES):
+        raise ValueError(f"Secret length must be at least {len(_REQUIRED_CLASSES)}.")
+
+    chars = [secrets.choice(charset) for charset in _REQUIRED_CLASSES]
+    chars += _random_alphabet_chars(length - len(chars))
+    _rng.shuffle(chars)
+    return ''.join(chars)
 # --- END OF FILE utils/password_generator.py ---
\ No newline at end of file
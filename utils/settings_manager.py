@@ -1,5 +1,9 @@
+import logging
 import os
-from threading import Lock
+import time
+from collections import ChainMap
+from threading import Event, Lock
+from types import MappingProxyType
 from . import db_manager
 
 
@@ -21,60 +25,178 @@ DEFAULT_SETTINGS = {
 }
 
 
-# A simple in-memory cache for settings to reduce DB calls.
-settings_cache = {}
-cache_lock = Lock()
+# Stored strings accepted for switch settings (compared lower-cased).
+_TRUTHY = frozenset(('true', '1', 't', 'yes', 'on'))
+_FALSY = frozenset(('false', '0', 'f', 'no', 'off', ''))
+
+def _to_bool(value):
+    """Recognised true/false strings (any case) become booleans; anything else is returned unchanged."""
+    if isinstance(value, str):
+        lowered = value.lower()
+        if lowered in _TRUTHY:
+            return True
+        if lowered in _FALSY:
+            return False
+    return value
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value # Leave bad values for the caller to reject, as before
+
+# How each known setting's stored string is converted, derived from its default value.
+_SETTING_TYPES = {
+    key: _to_bool if default.lower() in ('true', 'false') else _to_int if default.isdigit() else str
+    for key, default in DEFAULT_SETTINGS.items()
+}
+
+def _coerce(key, value):
+    """Converts a stored setting string to its typed value."""
+    if value is None:
+        return None
+    return _SETTING_TYPES.get(key, _to_bool)(value)
+
+
+# Current settings as immutable snapshots: the stored strings (returned by get_all_settings)
+# and the same settings already converted to their types (used by get_setting). Readers use
+# whatever snapshot the reference points at without locking; writers build new mappings and
+# swap the references under _write_lock, so a reader sees either the old or the new
+# settings, never a mix.
+_stored = {} # Values loaded from or saved to the database, without defaults
+_raw_settings_ref = None
+_settings_ref = None
+_write_lock = Lock()
 STORAGE_MODE = os.environ.get('CREDENTIAL_STORAGE_MODE', 'file').lower()
 
-def get_all_settings():
+# In db mode the snapshot is reloaded once it is older than this many seconds, so changes
+# saved by another process (e.g. the UI while the API is running) are picked up.
+SETTINGS_CACHE_TTL = float(os.environ.get('SETTINGS_CACHE_TTL', '30'))
+# After a failed reload the current snapshot is kept and the reload retried this many seconds later.
+SETTINGS_RETRY_DELAY = 5.0
+_loaded_at = 0.0
+
+# Single-flight reload state, guarded by _write_lock. Only one thread queries the database
+# when the snapshot goes stale; the others wait on _reload_event and reuse its result.
+_reloading = False
+_reload_event = Event()
+_generation = 0 # Bumped by save_settings so an in-flight reload can't overwrite newer values
+
+# Serializes save_settings calls against each other. Held across the database write, which
+# _write_lock never is, so a save doesn't hold up reloads (and the readers waiting on them).
+_save_lock = Lock()
+
+# Defaults converted once; a reload only converts the values stored in the database.
+_TYPED_DEFAULTS = {key: _coerce(key, value) for key, value in DEFAULT_SETTINGS.items()}
+
+def _publish(stored: dict):
     """
-    Loads all settings from the database, falling back to defaults
-    for any that are missing. This populates the cache.
+    Swaps in new snapshots for the stored values layered over the defaults.
+    Call with _write_lock held.
     """
-    with cache_lock:
-        global settings_cache
-        if STORAGE_MODE == 'db':
-            db_settings = db_manager.db_get_all_settings()
-            settings_cache = {**DEFAULT_SETTINGS, **db_settings}
+    global _stored, _raw_settings_ref, _settings_ref, _loaded_at
+    typed = dict(_TYPED_DEFAULTS)
+    for key, value in stored.items():
+        typed[key] = _coerce(key, value)
+    _settings_ref = MappingProxyType(typed) # Flat dict: this is the one get_setting reads
+    _raw_settings_ref = MappingProxyType(ChainMap(stored, DEFAULT_SETTINGS)) # Defaults aren't copied
+    _stored = stored
+    _loaded_at = time.monotonic()
+
+def _is_fresh() -> bool:
+    # The snapshot is primed at import, so it only needs an age check (and none in file mode).
+    return STORAGE_MODE != 'db' or time.monotonic() - _loaded_at < SETTINGS_CACHE_TTL
+
+def _reload(force: bool = False):
+    """Reloads settings from the database, or waits for a reload already in progress."""
+    global _reloading, _loaded_at
+    with _write_lock:
+        if not force and _is_fresh():
+            return # Another thread reloaded while we were waiting for the lock
+        if _reloading:
+            leader = False
         else:
-            settings_cache = DEFAULT_SETTINGS.copy()
-        return settings_cache
+            leader = True
+            _reloading = True
+            _reload_event.clear()
+            generation = _generation
+
+    if not leader:
+        _reload_event.wait(timeout=5)
+        return
+
+    try:
+        stored = db_manager.db_get_all_settings() if STORAGE_MODE == 'db' else {}
+        with _write_lock:
+            if stored is None:
+                # The database couldn't be read. Never publish that as an empty store: keep
+                # the current snapshot (defaults if nothing has loaded yet) and retry soon.
+                if _settings_ref is None:
+                    _publish({})
+                _loaded_at = time.monotonic() - SETTINGS_CACHE_TTL + min(SETTINGS_RETRY_DELAY, SETTINGS_CACHE_TTL)
+            elif generation == _generation:
+                _publish(stored)
+    finally:
+        with _write_lock:
+            _reloading = False
+        _reload_event.set()
+
+def get_all_settings(force: bool = False):
+    """
+    Returns a read-only snapshot of the stored settings, with defaults for
+    any that are missing. The snapshot is reloaded from the database once it
+    is older than SETTINGS_CACHE_TTL, or immediately when force is True.
+    """
+    if force or not _is_fresh():
+        _reload(force)
+    return _raw_settings_ref
 
 def get_setting(key, default=None):
     """
-    Retrieves a single setting value by key, using the cache.
-    Populates the cache on first run.
+    Retrieves a single setting by key from the cache, already converted
+    to its type (booleans for switches, ints for numeric settings).
+    Reloads the cache first if it has gone stale.
+    """
+    if not _is_fresh():
+        _reload()
+    value = _settings_ref.get(key)
+    return value if value is not None else default
+
+def get_settings(keys) -> dict:
+    """
+    Retrieves several settings at once from a single snapshot, typed like get_setting().
+    Missing keys map to None.
     """
-    with cache_lock:
-        if not settings_cache:
-            get_all_settings() 
-        
-        value_str = settings_cache.get(key)
-        
-        if isinstance(value_str, str):
-            if value_str.lower() == 'true':
-                return True
-            if value_str.lower() == 'false':
-                return False
-        
-        return value_str if value_str is not None else default
+    if not _is_fresh():
+        _reload()
+    settings = _settings_ref
+    return {key: settings.get(key) for key in keys}
 
 def save_settings(new_settings: dict):
     """
     Saves a dictionary of settings to the database and updates the cache.
+    Every known key is written, even if the cache shows the same value: the cache can be
+    up to SETTINGS_CACHE_TTL old, and another process may have changed the stored value.
     """
     if STORAGE_MODE != 'db':
         return
 
-    with cache_lock:
-        global settings_cache
+    global _generation
+    with _save_lock:
+        to_save = {}
         for key, value in new_settings.items():
             if key in DEFAULT_SETTINGS:
-                str_value = str(value)
-                db_manager.db_save_setting(key, str_value)
-                settings_cache[key] = str_value
+                to_save[key] = str(value)
             else:
                 print(f"Warning: Attempted to save unknown setting '{key}'. Ignoring.")
+        if to_save:
+            db_manager.db_save_settings(to_save) # One transaction for every key
+            with _write_lock: # Only held for the swap
+                _generation += 1
+                _publish({**_stored, **to_save})
+        logging.getLogger("system").debug("Settings saved: %d keys.", len(to_save))
 
-# Initialize the cache on startup
-get_all_settings()
+# Initialize the cache on startup. Readers rely on the snapshot always being present.
+get_all_settings(force=True)
+if _settings_ref is None:
+    raise RuntimeError("settings cache failed to initialize")
@@ -0,0 +1,147 @@
+"""
+Async variants of the Vonage DID operations used by the API (search, buy, update, cancel).
+
+These mirror the synchronous functions in client.py — same arguments after the
+client, same (response_data, status_code) results and the same request/response
+logging — but run as coroutines on an httpx.AsyncClient, so a batch endpoint can
+keep many Vonage calls in flight on its event loop without a worker thread each.
+"""
+
+import asyncio
+import json
+import httpx
+import orjson
+from utils.logger import log_request_response
+from .client import (
+    NEXMO_SEARCH_API_URL, NEXMO_BUY_API_URL, NEXMO_CANCEL_API_URL, NEXMO_UPDATE_API_URL, NEXMO_OWNED_API_URL,
+    _auth_headers, _handle_vonage_error, _lists_msisdn, _tag_did, _did_payload, _did_request_details,
+    _buy_result, _buy_verified_result, _cancel_result, _update_result
+)
+
+# Shared client for the FastAPI event loop. An httpx.AsyncClient is bound to the loop it
+# is first used on, so code running its own loop (e.g. asyncio.run) should use new_client().
+_client = None
+
+
+def new_client() -> httpx.AsyncClient:
+    """
+    Creates a client with pooled keep-alive connections. HTTP/2 is negotiated where the
+    Vonage host supports it, so a batch's requests are multiplexed over a few TLS
+    connections instead of one per in-flight call. Only connection failures are
+    retried, so a purchase POST is never sent twice.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30)
+    )
+    return httpx.AsyncClient(transport=transport, follow_redirects=True)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = new_client()
+    return _client
+
+
+async def close_client():
+    """Closes the shared client, if one was created."""
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+
+
+async def search_dids_async(client, username, password, search_params, log_enabled=False):
+    """
+    Searches for available DIDs with a single request, so at most 100 numbers.
+    Larger searches need client.search_dids, which pages through the results.
+    """
+    operation_name = "Vonage DID Search"
+    request_details = {"URL": NEXMO_SEARCH_API_URL, "Method": "GET", "Auth": (username, password), "Params": search_params}
+    response_data, status_code = None, None
+    try:
+        response = await client.get(NEXMO_SEARCH_API_URL, params=search_params, headers=_auth_headers(username, password), timeout=20)
+        response.raise_for_status()
+        try:
+            response_data = orjson.loads(response.content)
+        except json.JSONDecodeError:
+            response_data = {"error": f"Search failed (non-JSON response, status {response.status_code})"}
+        status_code = response.status_code
+    except Exception as e:
+        response_data, status_code = _handle_vonage_error(e, "Search DID")
+    finally:
+        if isinstance(response_data, dict):
+            response_data.setdefault('numbers', [])
+            response_data.setdefault('count', len(response_data['numbers']))
+        if log_enabled:
+            log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
+    return response_data, status_code
+
+
+async def _verify_did_ownership_async(client, username, password, msisdn, log_enabled=False):
+    operation_name = f"Vonage DID Ownership Verification ({msisdn})"
+    search_params = { 'pattern': msisdn, 'search_pattern': 0, 'size': 1 }
+    request_details = {"URL": NEXMO_OWNED_API_URL, "Method": "GET", "Auth": (username, password), "Params": search_params}
+    response_data, status_code = None, None
+    try:
+        response = await client.get(NEXMO_OWNED_API_URL, params=search_params, headers=_auth_headers(username, password), timeout=20)
+        response.raise_for_status()
+        response_data = orjson.loads(response.content)
+        status_code = response.status_code
+        return _lists_msisdn(response_data, msisdn), response_data
+    except httpx.HTTPError as e:
+        response_data, status_code = _handle_vonage_error(e, f"Verify Ownership {msisdn}")
+        return False, response_data
+    finally:
+        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
+
+
+async def buy_did_async(client, username, password, country, msisdn, target_api_key=None, log_enabled=False, treat_420_as_success=False, verify_on_420=False):
+    buy_payload = _did_payload(country, msisdn, {'target_api_key': target_api_key} if target_api_key else None)
+    operation_name = f"Vonage DID Buy ({msisdn})"
+    response_data, status_code = None, None
+    try:
+        response = await client.post(NEXMO_BUY_API_URL, data=buy_payload, headers=_auth_headers(username, password), timeout=45)
+        if response.status_code == 420 and verify_on_420:
+            await asyncio.sleep(2)
+            is_owned, verification_details = await _verify_did_ownership_async(client, username, password, msisdn, log_enabled)
+            response_data, status_code = _buy_verified_result(response, is_owned, verification_details, msisdn, country)
+        else:
+            response_data, status_code = _buy_result(response, msisdn, country, treat_420_as_success)
+    except Exception as e: response_data, status_code = _tag_did(_handle_vonage_error(e, f"Buy DID {msisdn}"), msisdn, country)
+    finally:
+        if log_enabled: log_request_response(operation_name, _did_request_details(NEXMO_BUY_API_URL, username, password, buy_payload), response_data, status_code, account_id=username)
+    return response_data, status_code
+
+
+async def cancel_did_async(client, username, password, country, msisdn, log_enabled=False):
+    """Cancels (releases) a specific Vonage DID from an account."""
+    cancel_payload = _did_payload(country, msisdn)
+    operation_name = f"Vonage DID Cancel ({msisdn})"
+    response_data, status_code = None, None
+    try:
+        response = await client.post(NEXMO_CANCEL_API_URL, data=cancel_payload, headers=_auth_headers(username, password), timeout=30)
+        response_data, status_code = _cancel_result(response, msisdn)
+    except Exception as e:
+        response_data, status_code = _tag_did(_handle_vonage_error(e, f"Cancel DID {msisdn}"), msisdn)
+    finally:
+        if log_enabled:
+            log_request_response(operation_name, _did_request_details(NEXMO_CANCEL_API_URL, username, password, cancel_payload), response_data, status_code, account_id=username)
+    return response_data, status_code
+
+
+async def update_did_async(client, username, password, country, msisdn, config, log_enabled=False, treat_420_as_success=False):
+    """Updates the configuration of a Vonage DID."""
+    update_payload = _did_payload(country, msisdn, config)
+    operation_name = f"Vonage DID Update ({msisdn})"
+    response_data, status_code = None, None
+    try:
+        response = await client.post(NEXMO_UPDATE_API_URL, data=update_payload, headers=_auth_headers(username, password), timeout=30)
+        response_data, status_code = _update_result(response, msisdn, country, treat_420_as_success)
+    except Exception as e:
+        response_data, status_code = _tag_did(_handle_vonage_error(e, f"Update DID {msisdn}"), msisdn)
+    finally:
+        if log_enabled:
+            log_request_response(operation_name, _did_request_details(NEXMO_UPDATE_API_URL, username, password, update_payload), response_data, status_code, account_id=username)
+    return response_data, status_code
@@ -1,7 +1,15 @@
+import httpx
+import logging
 import requests
+import os
 import json
-import traceback
+import reprlib
+import base64
+import orjson
 import time
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from utils.logger import log_request_response
 
 # Define Vonage API URLs
@@ -13,118 +21,226 @@ NEXMO_UPDATE_API_URL = 'https://rest.nexmo.com/number/update'
 NEXMO_OWNED_API_URL = 'https://rest.nexmo.com/account/numbers'
 VONAGE_ACCOUNTS_API_URL = 'https://api.nexmo.com/accounts'
 
+# Built once rather than on every call.
+_NEXMO_PSIP_BASE = NEXMO_PSIP_API_URL.rstrip('/')
+# Sent on every call. Accept-Encoding is spelled out so large listings are always requested
+# compressed, whatever the library defaults; only encodings both requests and httpx decode
+# without extra packages are offered. Only ever read; requests/httpx copy it into each request.
+_STD_HEADERS = {'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'}
+
+
+def _auth_headers(username, password):
+    """
+    Returns request headers with Basic Authorization for the credential, encoded as
+    latin-1 like requests' HTTPBasicAuth. Built per call on purpose: a cache would be
+    keyed by plaintext API secrets and outlive rotated or deleted credentials.
+    """
+    token = base64.b64encode(f"{username}:{password}".encode('latin1')).decode('ascii')
+    return {**_STD_HEADERS, 'Authorization': f"Basic {token}"}
+
+# Vonage errors and DID results are reported on the queued system logger rather than printed.
+_log = logging.getLogger("system")
+
+# Full stack traces for unexpected errors are only logged when DEBUG_VONAGE_ERRORS=1, so an
+# error storm during a bulk run doesn't spend its time formatting and flooding the log.
+_TRACE_ERRORS = os.environ.get('DEBUG_VONAGE_ERRORS') == '1'
+
+# Bounded repr for error bodies that carry no usable message field.
+_error_repr = reprlib.Repr()
+_error_repr.maxlevel, _error_repr.maxdict, _error_repr.maxlist, _error_repr.maxstring = 3, 10, 10, 120
+
+# One shared session for every Vonage call, so connections (and their TLS handshakes) to
+# api.nexmo.com / rest.nexmo.com are pooled and reused instead of opened per request.
+# Retries only cover connection failures and 502/503/504 on idempotent methods; a POST
+# such as a DID purchase is never re-sent. Cookies are refused because the session is
+# shared across accounts and credentials are sent explicitly on each call.
+_session = requests.Session()
+_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=(502, 503, 504), raise_on_status=False)
+)
+_session.mount('https://', _adapter)
+
+
+def _parse_json(response):
+    """
+    Parses a response body with orjson. A body that isn't JSON raises requests'
+    JSONDecodeError, the same exception response.json() raises.
+    """
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos)
+
+
+def _http_error_result(response, operation_name="Request"):
+    """
+    Builds the (error_data, status_code) result for a Vonage error response.
+    Works with both requests and httpx responses.
+    """
+    status_code = response.status_code
+    error_data_text = response.text
+    error_data_json = {}
+    api_error_message = f"HTTP {status_code}"
+    try:
+        error_data_json = orjson.loads(response.content) # Also used for httpx responses
+        if isinstance(error_data_json, dict):
+            api_error_message = error_data_json.get('error-code-label') or \
+                                error_data_json.get('title') or \
+                                error_data_json.get('detail') or \
+                                _error_repr.repr(error_data_json)
+        else:
+            api_error_message = _error_repr.repr(error_data_json)
+    except json.JSONDecodeError:
+        api_error_message = error_data_text if error_data_text else api_error_message
+
+    _log.error("%s Error: Request failed. Status: %s, API Error: '%s', Raw Response: '%s...'", operation_name, status_code, api_error_message, error_data_text[:200])
+    return {
+        "error": f"{operation_name} request failed: {api_error_message}",
+        "response_data_json": error_data_json,
+        "response_data_text": error_data_text
+    }, status_code
+
 
 def _handle_vonage_error(e, operation_name="Request"):
-    """(Function unchanged)"""
+    """Maps an exception from a Vonage call (requests or httpx) to an (error_data, status_code) result."""
     try:
-        if isinstance(e, requests.exceptions.Timeout):
-            print(f"{operation_name} Error: Request timed out: {e}")
+        # HTTP error responses are by far the most common case, so they're checked first.
+        # requests and httpx (async_client.py) exceptions map to the same results.
+        if isinstance(e, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
+            return _http_error_result(e.response, operation_name)
+        elif isinstance(e, (requests.exceptions.Timeout, httpx.TimeoutException)):
+            _log.error("%s Error: Request timed out: %s", operation_name, e)
             return {"error": f"{operation_name} request timed out"}, 504
-        elif isinstance(e, requests.exceptions.ConnectionError):
-            print(f"{operation_name} Error: Connection error: {e}")
+        elif isinstance(e, (requests.exceptions.ConnectionError, httpx.NetworkError)):
+            _log.error("%s Error: Connection error: %s", operation_name, e)
             return {"error": f"{operation_name} connection error"}, 503
-        elif isinstance(e, requests.exceptions.HTTPError):
-            status_code = e.response.status_code
-            error_data_text = e.response.text
-            error_data_json = {}
-            api_error_message = f"HTTP {status_code}"
-            try:
-                error_data_json = e.response.json()
-                api_error_message = error_data_json.get('error-code-label') or \
-                                    error_data_json.get('title') or \
-                                    error_data_json.get('detail') or \
-                                    str(error_data_json)
-            except json.JSONDecodeError:
-                api_error_message = error_data_text if error_data_text else api_error_message
-
-            print(f"{operation_name} Error: Request failed. Status: {status_code}, API Error: '{api_error_message}', Raw Response: '{error_data_text[:200]}...'")
-            return {
-                "error": f"{operation_name} request failed: {api_error_message}",
-                "response_data_json": error_data_json,
-                "response_data_text": error_data_text
-            }, status_code
-        elif isinstance(e, requests.exceptions.RequestException):
-            print(f"{operation_name} Error: Unexpected request exception: {e}")
+        elif isinstance(e, (requests.exceptions.RequestException, httpx.HTTPError)):
+            _log.error("%s Error: Unexpected request exception: %s", operation_name, e)
             return {"error": f"Unexpected {operation_name} request error: {str(e)}"}, 500
         else:
-            print(f"{operation_name} Error: Unexpected internal server error: {e}")
-            traceback.print_exc()
+            _log.error("%s Error: Unexpected internal server error: %r", operation_name, e, exc_info=_TRACE_ERRORS)
             return {"error": f"An internal server error occurred during {operation_name} request."}, 500
-    except Exception as handler_ex:
-        print(f"CRITICAL ERROR in _handle_vonage_error for {operation_name}: {handler_ex}")
-        traceback.print_exc()
+    except Exception:
+        _log.exception("CRITICAL ERROR in _handle_vonage_error for %s", operation_name)
         return {"error": "An critical internal error occurred during error handling."}, 500
 
 
-# ... create_psip, get_psip_domains, etc. ...
-def create_psip(username, password, payload, log_enabled=False):
-    operation_name = "Vonage PSIP Create"
-    request_details = {"URL": NEXMO_PSIP_API_URL, "Method": "POST", "Auth": (username, password), "Payload": payload}
-    response_data, status_code = None, None
-    try:
-        response = requests.post(NEXMO_PSIP_API_URL, auth=(username, password), json=payload, headers={'Accept': 'application/json'}, timeout=30)
-        response.raise_for_status()
-        try: response_data = response.json()
-        except json.JSONDecodeError: response_data = {"message": "PSIP request successful, but response was not JSON.", "raw_response": response.text}
-        status_code = response.status_code
-    except requests.exceptions.RequestException as e: response_data, status_code = _handle_vonage_error(e, "PSIP")
-    except Exception as e: response_data, status_code = _handle_vonage_error(e, "PSIP")
-    finally:
-        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
+def _tag_did(result, msisdn, country=None):
+    """Adds the DID's msisdn (and country) to an error result from the handlers above."""
+    response_data, status_code = result
+    response_data['msisdn'] = msisdn
+    if country is not None: response_data['country'] = country
     return response_data, status_code
 
-def get_psip_domains(username, password, log_enabled=False):
-    operation_name = "Vonage PSIP Get All Domains"
-    request_details = {"URL": NEXMO_PSIP_API_URL, "Method": "GET", "Auth": (username, password)}
+
+# --- Buy/cancel/update helpers shared with async_client.py ---
+# They build the request and turn the response into a result the same way for requests
+# and httpx responses, so the sync and async clients differ only in how the call is sent.
+
+def _did_payload(country, msisdn, extra=None):
+    """Form payload for the buy/cancel/update calls: country and msisdn plus any extra fields."""
+    return {'country': country, 'msisdn': msisdn, **(extra or {})}
+
+
+def _did_request_details(url, username, password, payload):
+    """Request details for the log entry of a buy/cancel/update call."""
+    return {"URL": url, "Method": "POST", "Auth": (username, password), "Payload": payload}
+
+
+def _merge_json_body(response_data, response):
+    """Merges a successful response's JSON body into response_data; a body that isn't JSON is ignored."""
+    try: response_data.update(orjson.loads(response.content))
+    except json.JSONDecodeError: pass
+    return response_data
+
+
+def _buy_result(response, msisdn, country, treat_420_as_success=False):
+    """Result of a buy response. A 420 that should be verified is handled with _buy_verified_result instead."""
+    status_code = response.status_code
+    if status_code == 420 and treat_420_as_success:
+        return _merge_json_body({"message": f"Purchase treated as successful (API returned {status_code}).", "msisdn": msisdn, "country": country}, response), 200
+    if status_code >= 400:
+        return _tag_did(_http_error_result(response, f"Buy DID {msisdn}"), msisdn, country)
+    return _merge_json_body({"message": "Purchase successful", "msisdn": msisdn, "country": country}, response), status_code
+
+
+def _buy_verified_result(response, is_owned, verification_details, msisdn, country):
+    """Result of a buy that returned 420 and was then checked with an ownership lookup."""
+    if is_owned:
+        return {"message": "Purchase verified as successful after initial API response 420.", "verification_details": verification_details, "msisdn": msisdn, "country": country}, 200
+    return _tag_did(_http_error_result(response, f"Buy DID {msisdn}"), msisdn, country)
+
+
+def _cancel_result(response, msisdn):
+    """Result of a cancel response. The success body is often empty or a simple confirmation."""
+    if response.status_code >= 400:
+        return _tag_did(_http_error_result(response, f"Cancel DID {msisdn}"), msisdn)
+    _log.info("Cancel Success: Released %s.", msisdn)
+    return _merge_json_body({"message": f"DID '{msisdn}' cancelled successfully.", "msisdn": msisdn}, response), response.status_code
+
+
+def _update_result(response, msisdn, country, treat_420_as_success=False):
+    """Result of an update response."""
+    status_code = response.status_code
+    if status_code == 420 and treat_420_as_success:
+        return _merge_json_body({"message": f"Update treated as successful (API returned {status_code}).", "msisdn": msisdn, "country": country}, response), 200
+    if status_code >= 400:
+        return _tag_did(_http_error_result(response, f"Update DID {msisdn}"), msisdn)
+    return _merge_json_body({"message": "Update successful", "msisdn": msisdn, "country": country}, response), status_code
+
+
+def _send(operation_name, error_label, method, url, auth, log_enabled, payload=None, on_non_json=None, empty_response=None):
+    """
+    Sends a single JSON Vonage request and returns (response_data, status_code), with the
+    error handling and request/response logging shared by the simple client calls.
+
+    on_non_json(text) builds the result for a successful response that isn't JSON
+    (without it, that is treated as an error); empty_response is returned as-is for
+    an empty successful response. The log entry is only built when log_enabled.
+    """
     response_data, status_code = None, None
     try:
-        response = requests.get(NEXMO_PSIP_API_URL, auth=(username, password), headers={'Accept': 'application/json'}, timeout=30)
+        response = _session.request(method, url, json=payload, headers=_auth_headers(*auth), timeout=30)
         response.raise_for_status()
-        try: response_data = response.json()
-        except json.JSONDecodeError: response_data = {"message": "PSIP get all domains request successful, but response was not JSON.", "raw_response": response.text}
         status_code = response.status_code
-    except requests.exceptions.RequestException as e: response_data, status_code = _handle_vonage_error(e, "PSIP Get All")
-    except Exception as e: response_data, status_code = _handle_vonage_error(e, "PSIP Get All")
+        if empty_response is not None and not response.text:
+            response_data = empty_response
+        else:
+            try: response_data = _parse_json(response)
+            except json.JSONDecodeError:
+                if on_non_json is None: raise
+                response_data = on_non_json(response.text)
+    except Exception as e: response_data, status_code = _handle_vonage_error(e, error_label)
     finally:
-        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
+        if log_enabled:
+            request_details = {"URL": url, "Method": method, "Auth": auth}
+            if payload is not None: request_details["Payload"] = payload
+            log_request_response(operation_name, request_details, response_data, status_code, account_id=auth[0])
     return response_data, status_code
 
 
+def create_psip(username, password, payload, log_enabled=False):
+    return _send("Vonage PSIP Create", "PSIP", "POST", NEXMO_PSIP_API_URL, (username, password), log_enabled, payload=payload,
+                 on_non_json=lambda text: {"message": "PSIP request successful, but response was not JSON.", "raw_response": text})
+
+def get_psip_domains(username, password, log_enabled=False):
+    return _send("Vonage PSIP Get All Domains", "PSIP Get All", "GET", NEXMO_PSIP_API_URL, (username, password), log_enabled,
+                 on_non_json=lambda text: {"message": "PSIP get all domains request successful, but response was not JSON.", "raw_response": text})
+
+
 def update_psip_domain(username, password, domain_name, payload, log_enabled=False):
-    operation_name = f"Vonage PSIP Update Domain ({domain_name})"
-    url = f"{NEXMO_PSIP_API_URL.rstrip('/')}/{domain_name}"
-    request_details = {"URL": url, "Method": "PUT", "Auth": (username, password), "Payload": payload}
-    response_data, status_code = None, None
-    try:
-        response = requests.put(url, auth=(username, password), json=payload, headers={'Accept': 'application/json'}, timeout=30)
-        response.raise_for_status()
-        try: response_data = response.json()
-        except json.JSONDecodeError: response_data = {"message": "PSIP update request successful, but response was not JSON.", "raw_response": response.text}
-        status_code = response.status_code
-    except requests.exceptions.RequestException as e: response_data, status_code = _handle_vonage_error(e, f"PSIP Update ({domain_name})")
-    except Exception as e: response_data, status_code = _handle_vonage_error(e, f"PSIP Update ({domain_name})")
-    finally:
-        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
-    return response_data, status_code
+    url = f"{_NEXMO_PSIP_BASE}/{domain_name}"
+    return _send(f"Vonage PSIP Update Domain ({domain_name})", f"PSIP Update ({domain_name})", "PUT", url, (username, password), log_enabled, payload=payload,
+                 on_non_json=lambda text: {"message": "PSIP update request successful, but response was not JSON.", "raw_response": text})
 
 def delete_psip_domain(username, password, domain_name, log_enabled=False):
-    operation_name = f"Vonage PSIP Delete Domain ({domain_name})"
-    url = f"{NEXMO_PSIP_API_URL.rstrip('/')}/{domain_name}"
-    request_details = {"URL": url, "Method": "DELETE", "Auth": (username, password)}
-    response_data, status_code = None, None
-    try:
-        response = requests.delete(url, auth=(username, password), headers={'Accept': 'application/json'}, timeout=30)
-        response.raise_for_status()
-        status_code = response.status_code
-        if response.text:
-            try: response_data = response.json()
-            except json.JSONDecodeError: response_data = {"raw_response": response.text}
-        else: response_data = {"message": f"Domain '{domain_name}' deleted successfully."}
-    except requests.exceptions.RequestException as e: response_data, status_code = _handle_vonage_error(e, f"PSIP Delete ({domain_name})")
-    except Exception as e: response_data, status_code = _handle_vonage_error(e, f"PSIP Delete ({domain_name})")
-    finally:
-        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
-    return response_data, status_code
+    url = f"{_NEXMO_PSIP_BASE}/{domain_name}"
+    return _send(f"Vonage PSIP Delete Domain ({domain_name})", f"PSIP Delete ({domain_name})", "DELETE", url, (username, password), log_enabled,
+                 on_non_json=lambda text: {"raw_response": text},
+                 empty_response={"message": f"Domain '{domain_name}' deleted successfully."})
 
 
 def search_dids(username, password, search_params, log_enabled=False):
@@ -137,10 +253,10 @@ def search_dids(username, password, search_params, log_enabled=False):
         request_details = {"URL": NEXMO_SEARCH_API_URL, "Method": "GET", "Auth": (username, password), "Params": local_params}
         response_data, status_code = None, None
         try:
-            response = requests.get(NEXMO_SEARCH_API_URL, auth=(username, password), params=local_params, headers={'Accept': 'application/json'}, timeout=20)
+            response = _session.get(NEXMO_SEARCH_API_URL, params=local_params, headers=_auth_headers(username, password), timeout=20)
             response.raise_for_status()
             try:
-                response_data = response.json()
+                response_data = _parse_json(response)
             except json.JSONDecodeError:
                 response_data = {"error": f"Search failed (non-JSON response, status {response.status_code})"}
             status_code = response.status_code
@@ -171,10 +287,10 @@ def search_dids(username, password, search_params, log_enabled=False):
             response_data, status_code = None, None
 
             try:
-                response = requests.get(NEXMO_SEARCH_API_URL, auth=(username, password), params=params_for_page, headers={'Accept': 'application/json'}, timeout=20)
+                response = _session.get(NEXMO_SEARCH_API_URL, params=params_for_page, headers=_auth_headers(username, password), timeout=20)
                 response.raise_for_status()
                 try:
-                    response_data = response.json()
+                    response_data = _parse_json(response)
                 except json.JSONDecodeError:
                     response_data = {"error": f"Search failed on page {page_index} (non-JSON response, status {response.status_code})"}
                 status_code = response.status_code
@@ -213,18 +329,64 @@ def search_dids(username, password, search_params, log_enabled=False):
         
         return final_response, 200
 
+# Accounts owning more than this many numbers are not listed by get_owned_msisdns(), as
+# paging through them would cost more than looking the wanted numbers up one by one.
+_OWNED_LIST_MAX_NUMBERS = 1000
+
+
+def get_owned_msisdns(username, password, log_enabled=False):
+    """
+    Lists every MSISDN the account owns right now as a set, paging through /account/numbers.
+    Returns None if the account owns more than _OWNED_LIST_MAX_NUMBERS or the listing fails.
+    """
+    operation_name = "Vonage Owned Numbers Listing"
+    owned, page_index, response_data, status_code = set(), 1, None, None
+    try:
+        while True:
+            response = _session.get(NEXMO_OWNED_API_URL, params={'index': page_index, 'size': 100}, headers=_auth_headers(username, password), timeout=20)
+            response.raise_for_status()
+            status_code = response.status_code
+            data = _parse_json(response)
+            total = data.get('count', 0)
+            if total > _OWNED_LIST_MAX_NUMBERS:
+                response_data = {"count": total, "listed": False}
+                return None
+            page_numbers = data.get('numbers', [])
+            owned.update(num.get('msisdn') for num in page_numbers)
+            if not page_numbers or len(owned) >= total:
+                break
+            page_index += 1
+        response_data = {"count": len(owned), "listed": True}
+        return owned
+    except Exception as e:
+        response_data, status_code = _handle_vonage_error(e, operation_name)
+        return None
+    finally:
+        if log_enabled:
+            log_request_response(operation_name, {"URL": NEXMO_OWNED_API_URL, "Method": "GET", "Auth": (username, password), "Pages": page_index}, response_data, status_code, account_id=username)
+
+
+def _lists_msisdn(response_data, msisdn):
+    """
+    True if an /account/numbers response lists msisdn, stopping at the first match.
+    Ownership lookups ask for size=1 and get_owned_msisdns pages at 100, so bodies
+    stay small and are parsed whole with orjson rather than stream-parsed.
+    """
+    return any(num.get('msisdn') == msisdn for num in response_data.get('numbers', ()))
+
+
 def _verify_did_ownership(username, password, msisdn, log_enabled=False):
+    """Checks whether the account owns msisdn by looking the number up directly."""
     operation_name = f"Vonage DID Ownership Verification ({msisdn})"
     search_params = { 'pattern': msisdn, 'search_pattern': 0, 'size': 1 }
     request_details = {"URL": NEXMO_OWNED_API_URL, "Method": "GET", "Auth": (username, password), "Params": search_params}
     response_data, status_code = None, None
     try:
-        response = requests.get(NEXMO_OWNED_API_URL, auth=(username, password), params=search_params, headers={'Accept': 'application/json'}, timeout=20)
+        response = _session.get(NEXMO_OWNED_API_URL, params=search_params, headers=_auth_headers(username, password), timeout=20)
         response.raise_for_status()
-        response_data = response.json()
+        response_data = _parse_json(response)
         status_code = response.status_code
-        if response_data.get('count', 0) > 0 and any(num.get('msisdn') == msisdn for num in response_data.get('numbers', [])): return True, response_data
-        else: return False, response_data
+        return _lists_msisdn(response_data, msisdn), response_data
     except requests.exceptions.RequestException as e:
         response_data, status_code = _handle_vonage_error(e, f"Verify Ownership {msisdn}")
         return False, response_data
@@ -280,18 +442,17 @@ def list_owned_dids(username, password, search_params=None, log_enabled=False):
                 "Page": page_index
             }
 
-            response = requests.get(
+            response = _session.get(
                 NEXMO_OWNED_API_URL,
-                auth=(username, password),
                 params=params,
-                headers={'Accept': 'application/json'},
+                headers=_auth_headers(username, password),
                 timeout=20
             )
             status_code = response.status_code
 
             if status_code >= 400:
                 try:
-                    response_data = response.json()
+                    response_data = _parse_json(response)
                 except Exception:
                     response_data = {"error": f"HTTP {status_code}"}
                 if log_enabled:
@@ -299,7 +460,7 @@ def list_owned_dids(username, password, search_params=None, log_enabled=False):
                 logged_early_return = True
                 return response_data, status_code
 
-            data = response.json()
+            data = _parse_json(response)
 
             if page_index == 1:
                 api_total_count = data.get('count', 0)
@@ -337,120 +498,52 @@ def list_owned_dids(username, password, search_params=None, log_enabled=False):
 
 
 def buy_did(username, password, country, msisdn, target_api_key=None, log_enabled=False, treat_420_as_success=False, verify_on_420=False):
-    buy_payload = {'country': country, 'msisdn': msisdn}
-    if target_api_key: buy_payload['target_api_key'] = target_api_key
+    buy_payload = _did_payload(country, msisdn, {'target_api_key': target_api_key} if target_api_key else None)
     operation_name = f"Vonage DID Buy ({msisdn})"
-    request_details = {"URL": NEXMO_BUY_API_URL, "Method": "POST", "Auth": (username, password), "Payload": buy_payload}
     response_data, status_code = None, None
     try:
-        response = requests.post(NEXMO_BUY_API_URL, auth=(username, password), data=buy_payload, headers={'Accept': 'application/json'}, timeout=45)
-        response.raise_for_status()
-        status_code = response.status_code
-        response_data = {"message": "Purchase successful"}
-        try: response_data.update(response.json())
-        except json.JSONDecodeError: pass
-    except requests.exceptions.HTTPError as e:
-        api_status_code = e.response.status_code
-        if api_status_code == 420 and verify_on_420:
+        response = _session.post(NEXMO_BUY_API_URL, data=buy_payload, headers=_auth_headers(username, password), timeout=45)
+        if response.status_code == 420 and verify_on_420:
             time.sleep(2)
             is_owned, verification_details = _verify_did_ownership(username, password, msisdn, log_enabled)
-            if is_owned:
-                status_code = 200
-                response_data = {"message": "Purchase verified as successful after initial API response 420.", "verification_details": verification_details}
-            else: response_data, status_code = _handle_vonage_error(e, f"Buy DID {msisdn}")
-        elif api_status_code == 420 and treat_420_as_success:
-            status_code = 200
-            response_data = {"message": f"Purchase treated as successful (API returned {api_status_code})."}
-            try: response_data.update(e.response.json())
-            except json.JSONDecodeError: pass
-        else: response_data, status_code = _handle_vonage_error(e, f"Buy DID {msisdn}")
-    except requests.exceptions.RequestException as e: response_data, status_code = _handle_vonage_error(e, f"Buy DID {msisdn}")
-    except Exception as e: response_data, status_code = _handle_vonage_error(e, f"Buy DID {msisdn}")
+            response_data, status_code = _buy_verified_result(response, is_owned, verification_details, msisdn, country)
+        else:
+            response_data, status_code = _buy_result(response, msisdn, country, treat_420_as_success)
+    except Exception as e: response_data, status_code = _tag_did(_handle_vonage_error(e, f"Buy DID {msisdn}"), msisdn, country)
     finally:
-        if isinstance(response_data, dict):
-            response_data.setdefault('msisdn', msisdn)
-            response_data.setdefault('country', country)
-        else: response_data = {"data": response_data, "msisdn": msisdn, "country": country}
-        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
+        if log_enabled: log_request_response(operation_name, _did_request_details(NEXMO_BUY_API_URL, username, password, buy_payload), response_data, status_code, account_id=username)
     return response_data, status_code
 
 
 def cancel_did(username, password, country, msisdn, log_enabled=False):
     """Cancels (releases) a specific Vonage DID from an account."""
-    cancel_payload = {'country': country, 'msisdn': msisdn}
+    cancel_payload = _did_payload(country, msisdn)
     operation_name = f"Vonage DID Cancel ({msisdn})"
-    request_details = {"URL": NEXMO_CANCEL_API_URL, "Method": "POST", "Auth": (username, password), "Payload": cancel_payload}
     response_data, status_code = None, None
-    print(f"Cancelling DID: {msisdn} in {country}")
-
     try:
-        response = requests.post(
-            NEXMO_CANCEL_API_URL,
-            auth=(username, password),
-            data=cancel_payload,
-            headers={'Accept': 'application/json'},
-            timeout=30
-        )
-        response.raise_for_status() # Raises HTTPError for 4xx/5xx responses
-
-        # A 200 OK response indicates success
-        status_code = response.status_code
-        print(f"Cancel Success: Released {msisdn}.")
-        
-        # The success response is often empty or a simple confirmation.
-        response_data = {"message": f"DID '{msisdn}' cancelled successfully."}
-        try:
-            # Try to merge any JSON data from the response if it exists
-            response_data.update(response.json())
-        except json.JSONDecodeError:
-            pass # It's okay if there's no JSON body
-
-    except requests.exceptions.RequestException as e:
-        response_data, status_code = _handle_vonage_error(e, f"Cancel DID {msisdn}")
+        response = _session.post(NEXMO_CANCEL_API_URL, data=cancel_payload, headers=_auth_headers(username, password), timeout=30)
+        response_data, status_code = _cancel_result(response, msisdn)
     except Exception as e:
-        response_data, status_code = _handle_vonage_error(e, f"Cancel DID {msisdn}")
+        response_data, status_code = _tag_did(_handle_vonage_error(e, f"Cancel DID {msisdn}"), msisdn)
     finally:
-        if isinstance(response_data, dict):
-            response_data.setdefault('msisdn', msisdn)
-        else:
-            response_data = {"data": response_data, "msisdn": msisdn}
         if log_enabled:
-            log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
-            
+            log_request_response(operation_name, _did_request_details(NEXMO_CANCEL_API_URL, username, password, cancel_payload), response_data, status_code, account_id=username)
     return response_data, status_code
 
 
 def update_did(username, password, country, msisdn, config, log_enabled=False, treat_420_as_success=False):
     """Updates the configuration of a Vonage DID."""
-    update_payload = { 'country': country, 'msisdn': msisdn, **config }
+    update_payload = _did_payload(country, msisdn, config)
     operation_name = f"Vonage DID Update ({msisdn})"
-    request_details = {"URL": NEXMO_UPDATE_API_URL, "Method": "POST", "Auth": (username, password), "Payload": update_payload}
     response_data, status_code = None, None
     try:
-        response = requests.post(NEXMO_UPDATE_API_URL, auth=(username, password), data=update_payload, headers={'Accept': 'application/json'}, timeout=30)
-        api_status_code = response.status_code
-        if api_status_code == 420 and treat_420_as_success:
-            status_code = 200
-            response_data = {"message": f"Update treated as successful (API returned {api_status_code})."}
-            try: response_data.update(response.json())
-            except json.JSONDecodeError: pass
-        else:
-            response.raise_for_status()
-            status_code = api_status_code
-            response_data = {"message": "Update successful"}
-            try: response_data.update(response.json())
-            except json.JSONDecodeError: pass
-        response_data['msisdn'] = msisdn
-        response_data['country'] = country
-    except requests.exceptions.RequestException as e:
-        response_data, status_code = _handle_vonage_error(e, f"Update DID {msisdn}")
-        response_data['msisdn'] = msisdn
+        response = _session.post(NEXMO_UPDATE_API_URL, data=update_payload, headers=_auth_headers(username, password), timeout=30)
+        response_data, status_code = _update_result(response, msisdn, country, treat_420_as_success)
     except Exception as e:
-        response_data, status_code = _handle_vonage_error(e, f"Update DID {msisdn}")
-        response_data['msisdn'] = msisdn
+        response_data, status_code = _tag_did(_handle_vonage_error(e, f"Update DID {msisdn}"), msisdn)
     finally:
         if log_enabled:
-            log_request_response(operation_name, request_details, response_data, status_code, account_id=username)
+            log_request_response(operation_name, _did_request_details(NEXMO_UPDATE_API_URL, username, password, update_payload), response_data, status_code, account_id=username)
     return response_data, status_code
 
 
@@ -472,16 +565,10 @@ def list_subaccounts(primary_api_key, primary_api_secret, log_enabled=False):
         while current_url:
             request_details = {"URL": current_url, "Method": "GET", "Auth": (primary_api_key, primary_api_secret)}
             
-            response = requests.get(current_url, auth=(primary_api_key, primary_api_secret), headers={'Accept': 'application/json'}, timeout=30)
+            response = _session.get(current_url, headers=_auth_headers(primary_api_key, primary_api_secret), timeout=30)
             status_code = response.status_code
             
             if status_code >= 400:
-                # If we hit an error, parse it using the helper and break/return
-                try:
-                    error_json = response.json()
-                except:
-                    error_json = {"raw": response.text}
-                
                 # If it's the first page, just return the error. 
                 # If we successfully fetched pages before, we might want to return partial results, 
                 # but usually an error mid-stream is fatal for the list integrity.
@@ -491,7 +578,7 @@ def list_subaccounts(primary_api_key, primary_api_secret, log_enabled=False):
                     print(f"Error fetching subsequent page: {status_code}")
                     break
 
-            data = response.json()
+            data = _parse_json(response)
             last_response_data = data
             
             # Extract subaccounts from HAL structure (_embedded.subaccounts) or direct list
@@ -529,34 +616,12 @@ def list_subaccounts(primary_api_key, primary_api_secret, log_enabled=False):
 def create_subaccount(primary_api_key, primary_api_secret, payload, log_enabled=False):
     operation_name = f"Vonage Create Subaccount under {primary_api_key}"
     url = f"{VONAGE_ACCOUNTS_API_URL}/{primary_api_key}/subaccounts"
-    request_details = {"URL": url, "Method": "POST", "Auth": (primary_api_key, primary_api_secret), "Payload": payload}
-    response_data, status_code = None, None
-    try:
-        response = requests.post(url, auth=(primary_api_key, primary_api_secret), json=payload, headers={'Accept': 'application/json'}, timeout=30)
-        response.raise_for_status()
-        response_data = response.json()
-        status_code = response.status_code
-    except requests.exceptions.RequestException as e: response_data, status_code = _handle_vonage_error(e, operation_name)
-    except Exception as e: response_data, status_code = _handle_vonage_error(e, operation_name)
-    finally:
-        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=primary_api_key)
-    return response_data, status_code
+    return _send(operation_name, operation_name, "POST", url, (primary_api_key, primary_api_secret), log_enabled, payload=payload)
 
 def update_subaccount(primary_api_key, primary_api_secret, subaccount_key, payload, log_enabled=False):
     operation_name = f"Vonage Update Subaccount ({subaccount_key})"
     url = f"{VONAGE_ACCOUNTS_API_URL}/{primary_api_key}/subaccounts/{subaccount_key}"
-    request_details = {"URL": url, "Method": "PATCH", "Auth": (primary_api_key, primary_api_secret), "Payload": payload}
-    response_data, status_code = None, None
-    try:
-        response = requests.patch(url, auth=(primary_api_key, primary_api_secret), json=payload, headers={'Accept': 'application/json'}, timeout=30)
-        response.raise_for_status()
-        response_data = response.json()
-        status_code = response.status_code
-    except requests.exceptions.RequestException as e: response_data, status_code = _handle_vonage_error(e, operation_name)
-    except Exception as e: response_data, status_code = _handle_vonage_error(e, operation_name)
-    finally:
-        if log_enabled: log_request_response(operation_name, request_details, response_data, status_code, account_id=primary_api_key)
-    return response_data, status_code
+    return _send(operation_name, operation_name, "PATCH", url, (primary_api_key, primary_api_secret), log_enabled, payload=payload)
 
 
 def transfer_number(primary_api_key, primary_api_secret, from_api_key, to_api_key, number, country, log_enabled=False):
@@ -587,15 +652,14 @@ def transfer_number(primary_api_key, primary_api_secret, from_api_key, to_api_ke
     }
     response_data, status_code = None, None
     try:
-        response = requests.post(
+        response = _session.post(
             url,
-            auth=(primary_api_key, primary_api_secret),
             json=transfer_payload,
-            headers={'Accept': 'application/json'},
+            headers=_auth_headers(primary_api_key, primary_api_secret),
             timeout=30
         )
         response.raise_for_status()
-        response_data = response.json()
+        response_data = _parse_json(response)
         status_code = response.status_code
     except requests.exceptions.RequestException as e:
         response_data, status_code = _handle_vonage_error(e, operation_name)
@@ -16,7 +16,6 @@ Security:
 from flask import Blueprint, request, jsonify
 from utils import credentials_manager
 from utils import settings_manager
-from utils import encryption
 from utils import job_manager
 from . import client as vonage_client
 from .did_inventory_tasks import fetch_dids_for_accounts
@@ -40,36 +39,6 @@ def _build_search_params(data):
     return params if params else None
 
 
-def _decrypt_all_credentials(master_key):
-    """
-    Decrypts all stored credentials and returns a list of dicts.
-
-    Each dict contains: api_key, api_secret, account_name, api_key_hint.
-    Credentials that fail decryption are silently skipped.
-    The master key is NOT stored — only used transiently here.
-    """
-    all_creds = credentials_manager.get_all_credentials()
-    decrypted = []
-
-    for name, cred_data in all_creds.items():
-        try:
-            encrypted_secret = cred_data.get('encrypted_secret')
-            if not encrypted_secret:
-                continue
-            decrypted_secret = encryption.decrypt_data(encrypted_secret, master_key)
-            decrypted.append({
-                'api_key': cred_data['api_key'],
-                'api_secret': decrypted_secret,
-                'account_name': name,
-                'api_key_hint': cred_data.get('api_key_hint', '')
-            })
-        except Exception:
-            # Skip credentials that can't be decrypted
-            continue
-
-    return decrypted
-
-
 # --- Synchronous: Single Account ---
 
 @vonage_did_inventory_bp.route('/single', methods=['POST'])
@@ -155,7 +124,7 @@ def start_inventory_job():
 
     try:
         # Decrypt all credentials NOW — master key is not stored in the job
-        decrypted_creds = _decrypt_all_credentials(master_key)
+        decrypted_creds = credentials_manager.decrypt_all_credentials(master_key)
 
         if not decrypted_creds:
             return jsonify({
@@ -163,8 +132,9 @@ def start_inventory_job():
             }), 400
 
         search_params = _build_search_params(data)
-        log_enabled = settings_manager.get_setting('store_logs_enabled')
-        max_concurrency = int(settings_manager.get_setting('max_concurrent_requests', 5))
+        settings = settings_manager.get_settings(['store_logs_enabled', 'max_concurrent_requests'])
+        log_enabled = settings['store_logs_enabled']
+        max_concurrency = int(settings['max_concurrent_requests'] or 5)
 
         job_id, error = job_manager.create_job(
             fetch_dids_for_accounts,
@@ -15,6 +15,7 @@ Security layers (executed in order for each transfer):
 import re
 from flask import Blueprint, request, jsonify
 from utils import credentials_manager
+from utils.encryption import decrypt_data
 from utils import settings_manager
 from utils import notification_service
 from . import client as vonage_client
@@ -153,7 +154,7 @@ def transfer_did():
         ownership_verified = False
         try:
             # Look up source subaccount credentials from the store
-            all_creds = credentials_manager.get_all_credentials()
+            all_creds = credentials_manager.get_all_credentials_view()
             source_cred_entry = None
             for name, cred_data in all_creds.items():
                 if cred_data.get('api_key') == cleaned['from_api_key']:
@@ -161,7 +162,6 @@ def transfer_did():
                     break
 
             if source_cred_entry:
-                from utils.encryption import decrypt_data
                 source_secret = decrypt_data(source_cred_entry[1]['encrypted_secret'], master_key)
                 is_owned, _ = vonage_client._verify_did_ownership(
                     username=cleaned['from_api_key'],